@@ -1,130 +1,263 @@
-from flask import Flask, request, jsonify
+from quart import Quart, request
 import os
+import sys
+import platform
+import importlib
 import logging
-from typing import Dict, Any, Optional, List
-import json
+import logging.handlers
+import queue
+import asyncio
+import hashlib
+import time
+import functools
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator, Awaitable, Callable, Iterable
+import httpx
+import ijson
+import orjson
 
-app = Flask(__name__)
-logging.basicConfig(level=logging.INFO)
+# Serve with an ASGI server so concurrent requests share one event loop:
+#   hypercorn deleteUser:app --bind 0.0.0.0:3009 --workers 1
+app = Quart(__name__)
+
+# Records are queued from the event loop and written out by a listener thread,
+# so slow stderr or disk writes never stall concurrent requests
+log_queue: queue.Queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(log_queue)])
+log_listener.start()
+
+def _kernel_has_io_uring() -> bool:
+    """io_uring landed in Linux 5.1"""
+    if sys.platform != 'linux':
+        return False
+    try:
+        major, minor = (int(part) for part in platform.release().split('-')[0].split('.')[:2])
+    except ValueError:
+        return False
+    return (major, minor) >= (5, 1)
+
+def install_event_loop_policy():
+    """Select the event loop implementation before the serving loop is created
+    
+    IO_URING_LOOP_POLICY may name an io_uring-backed policy as "module:Class";
+    it is used on kernels that support io_uring. Otherwise uvloop (libuv) is
+    used when installed, and asyncio's default loop as a last resort.
+    """
+    policy_path = os.environ.get('IO_URING_LOOP_POLICY')
+    if policy_path and _kernel_has_io_uring():
+        module_name, _, class_name = policy_path.partition(':')
+        try:
+            policy_class = getattr(importlib.import_module(module_name), class_name)
+            asyncio.set_event_loop_policy(policy_class())
+            return
+        except (ImportError, AttributeError) as error:
+            logging.warning(f'io_uring loop policy {policy_path} unavailable: {error}')
+    
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+install_event_loop_policy()
+
+def ojsonify(obj: Any):
+    """Build a JSON response serialized with orjson"""
+    return app.response_class(orjson.dumps(obj), mimetype='application/json')
 
 BASE44_API_KEY = os.environ.get('BASE44_API_KEY')
 BASE44_API_URL = os.environ.get('BASE44_API_URL', 'https://api.base44.com')
 
+# How long a verified /auth/me result is reused for the same Authorization header
+AUTH_CACHE_TTL = 30
+AUTH_CACHE_MAX_ENTRIES = 1024
+
+# Upper bound on in-flight calls to Base44
+MAX_CONCURRENT_REQUESTS = 32
+
+# Transient statuses worth retrying a delete on, and how often to try
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503})
+DELETE_ATTEMPTS = 3
+
+# When disabled, users are only flagged as deleted and Base44's server-side
+# cascade triggers remove their challenges, trades and posts
+ENABLE_CLIENT_CASCADE = os.environ.get('ENABLE_CLIENT_CASCADE', 'true').lower() in ('1', 'true', 'yes')
+
+class _AsyncByteReader:
+    """Expose a streamed httpx response through the async read() ijson expects"""
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+    
+    async def read(self, size: int = -1) -> bytes:
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return b''
+
 class Base44Client:
     def __init__(self, api_key: str, base_url: str):
         self.api_key = api_key
         self.base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+        # Back-pressure for cascades that fan out thousands of calls at once
+        self._sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        # Entities whose bulk_delete endpoint is missing, so we stop probing it
+        self._bulk_unsupported: set = set()
+        # Digest of Authorization header -> (verified at, user)
+        self._auth_cache: Dict[bytes, Tuple[float, Dict[str, Any]]] = {}
+        # Record URL prefixes, relative to the client's base_url; ids are appended
+        self._entity_urls = {
+            entity: f"/entities/{entity}/"
+            for entity in ('User', 'Challenge', 'Trade', 'CommunityPost')
+        }
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP/2 client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            # Every call targets one host, so HTTP/2 multiplexes a whole
+            # deletion burst over a handful of connections
+            self._client = httpx.AsyncClient(
+                http2=True,
+                base_url=self.base_url,
+                timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+        return self._client
+    
+    @staticmethod
+    def _encode_payload(payload: Any, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if payload is not None:
+            kwargs['content'] = orjson.dumps(payload)
+            kwargs['headers'] = {**kwargs.get('headers', {}), 'Content-Type': 'application/json'}
+        return kwargs
+    
+    async def _request(self, method: str, url: str, payload: Any = None, **kwargs) -> httpx.Response:
+        """Issue a request on the shared client once a concurrency slot is free"""
+        kwargs = self._encode_payload(payload, kwargs)
+        async with self._sem:
+            return await self._get_client().request(method, url, **kwargs)
+    
+    async def _delete(self, url: str) -> bool:
+        """Delete a record, raising on transient failures so they can be retried"""
+        response = await self._request('DELETE', url)
+        if response.status_code in RETRYABLE_STATUSES:
+            response.raise_for_status()
+        return response.status_code == 200
+    
+    async def _stream_items(self, method: str, url: str, payload: Any = None, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the elements of a JSON array response as they are received"""
+        kwargs = self._encode_payload(payload, kwargs)
+        async with self._sem:
+            async with self._get_client().stream(method, url, **kwargs) as response:
+                if response.status_code != 200:
+                    return
+                async for item in ijson.items(_AsyncByteReader(response), 'item'):
+                    yield item
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
     
     async def create_client_from_request(self, req) -> 'Base44Client':
         return self
     
     async def get_user_from_request(self, req) -> Optional[Dict[str, Any]]:
         """Get authenticated user from request"""
-        auth_header = request.headers.get('Authorization')
+        auth_header = req.headers.get('Authorization')
         if not auth_header:
             return None
         
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{self.base_url}/auth/me",
-                headers={"Authorization": auth_header}
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                return None
-    
-    # Service role operations - using service key
+        # Key on a digest so bearer tokens are never kept in memory as-is
+        cache_key = hashlib.blake2b(auth_header.encode(), digest_size=16).digest()
+        now = time.monotonic()
+        cached = self._auth_cache.get(cache_key)
+        if cached and now - cached[0] < AUTH_CACHE_TTL:
+            return cached[1]
+        
+        # The caller's header overrides the client's service-role default
+        response = await self._request('GET', "/auth/me", headers={"Authorization": auth_header})
+        if response.status_code == 200:
+            user = orjson.loads(response.content)
+            if len(self._auth_cache) >= AUTH_CACHE_MAX_ENTRIES:
+                self._prune_auth_cache(now)
+            self._auth_cache[cache_key] = (now, user)
+            return user
+        if response.status_code == 401:
+            self._auth_cache.pop(cache_key, None)
+        return None
+    
+    def _prune_auth_cache(self, now: float):
+        """Drop expired auth entries, or everything if none have expired"""
+        expired = [key for key, (ts, _) in self._auth_cache.items() if now - ts >= AUTH_CACHE_TTL]
+        if not expired:
+            self._auth_cache.clear()
+        for key in expired:
+            del self._auth_cache[key]
+    
+    # Service role operations - the client sends the service key by default
     async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user by ID using service role"""
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{self.base_url}/entities/User/{user_id}",
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                return None
+        response = await self._request('GET', self._entity_urls['User'] + str(user_id))
+        return orjson.loads(response.content) if response.status_code == 200 else None
     
     async def delete_user(self, user_id: str) -> bool:
         """Delete user using service role"""
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(
-                f"{self.base_url}/entities/User/{user_id}",
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            ) as response:
-                return response.status == 200
+        return await self._delete(self._entity_urls['User'] + str(user_id))
+    
+    async def soft_delete_user(self, user_id: str) -> bool:
+        """Flag user as deleted using service role, leaving the cascade to Base44"""
+        response = await self._request('PATCH', self._entity_urls['User'] + str(user_id), payload={
+            'deleted': True,
+            'deleted_at': datetime.now(timezone.utc).isoformat()
+        })
+        return response.status_code == 200
     
     async def filter_challenges(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Filter challenges using service role"""
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/entities/Challenge/filter",
-                headers={"Authorization": f"Bearer {self.api_key}"},
-                json=filters
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                return []
+        response = await self._request('POST', self._entity_urls['Challenge'] + 'filter', payload=filters)
+        return orjson.loads(response.content) if response.status_code == 200 else []
     
     async def delete_challenge(self, challenge_id: str) -> bool:
         """Delete challenge using service role"""
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(
-                f"{self.base_url}/entities/Challenge/{challenge_id}",
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            ) as response:
-                return response.status == 200
-    
-    async def filter_trades(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Filter trades using service role"""
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/entities/Trade/filter",
-                headers={"Authorization": f"Bearer {self.api_key}"},
-                json=filters
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                return []
+        return await self._delete(self._entity_urls['Challenge'] + str(challenge_id))
+    
+    async def filter_trades(self, filters: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Stream trades matching filters using service role"""
+        async for trade in self._stream_items('POST', self._entity_urls['Trade'] + 'filter', payload=filters):
+            yield trade
     
     async def delete_trade(self, trade_id: str) -> bool:
         """Delete trade using service role"""
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(
-                f"{self.base_url}/entities/Trade/{trade_id}",
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            ) as response:
-                return response.status == 200
+        return await self._delete(self._entity_urls['Trade'] + str(trade_id))
     
     async def filter_community_posts(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Filter community posts using service role"""
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/entities/CommunityPost/filter",
-                headers={"Authorization": f"Bearer {self.api_key}"},
-                json=filters
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                return []
+        response = await self._request('POST', self._entity_urls['CommunityPost'] + 'filter', payload=filters)
+        return orjson.loads(response.content) if response.status_code == 200 else []
     
     async def delete_community_post(self, post_id: str) -> bool:
         """Delete community post using service role"""
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(
-                f"{self.base_url}/entities/CommunityPost/{post_id}",
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            ) as response:
-                return response.status == 200
+        return await self._delete(self._entity_urls['CommunityPost'] + str(post_id))
+    
+    async def bulk_delete(self, entity: str, filters: Dict[str, Any]) -> Optional[int]:
+        """Delete all entities matching filters in one request using service role
+        
+        Returns the number of deleted records, or None when the API does not
+        support bulk deletion for this entity.
+        """
+        if entity in self._bulk_unsupported:
+            return None
+        
+        response = await self._request('POST', self._entity_urls[entity] + 'bulk_delete', payload={'filter': filters})
+        if response.status_code == 200:
+            return orjson.loads(response.content).get('deleted', 0)
+        if response.status_code in (404, 405, 501):
+            self._bulk_unsupported.add(entity)
+        return None
 
 base44_client = Base44Client(
     api_key=BASE44_API_KEY,
@@ -134,70 +267,76 @@ base44_client = Base44Client(
 @app.route('/delete_user', methods=['POST'])
 async def delete_user():
     try:
-        # Get authenticated user from request
-        user = await base44_client.get_user_from_request(request)
+        # Parse request data up front so the target lookup can start right away
+        data = await request.get_json(silent=True)
+        user_id = data.get('userId') if isinstance(data, dict) else None
+
+        # Verify the caller and fetch the user to delete (service role)
+        # concurrently; the lookup is only used once admin access is confirmed
+        user, user_to_delete = await asyncio.gather(
+            base44_client.get_user_from_request(request),
+            base44_client.get_user(user_id) if user_id else asyncio.sleep(0)
+        )
         
         # Only admins can delete users
         if not user or user.get('role') != 'admin':
-            return jsonify({
+            return ojsonify({
                 'error': 'Forbidden: Admin access required'
             }), 403
 
-        # Parse request data
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'Invalid JSON data'}), 400
+        # silent=True turns a missing or malformed body into None instead of raising
+        if data is None:
+            return ojsonify({'error': 'Invalid JSON in request body'}), 400
 
-        user_id = data.get('userId')
         if not user_id:
-            return jsonify({'error': 'User ID is required'}), 400
+            return ojsonify({'error': 'User ID is required'}), 400
 
-        # Get user email before deletion using service role
-        user_to_delete = await base44_client.get_user(user_id)
         if not user_to_delete:
-            return jsonify({'error': 'User not found'}), 404
+            return ojsonify({'error': 'User not found'}), 404
+        
+        if not ENABLE_CLIENT_CASCADE:
+            # One PATCH; related data is culled by server-side triggers
+            if not await base44_client.soft_delete_user(user_id):
+                return ojsonify({
+                    'error': 'Failed to delete user',
+                    'success': False
+                }), 500
+            
+            return ojsonify({
+                'success': True,
+                'message': 'User marked as deleted, related data is removed server-side',
+                'soft_deleted': True
+            })
         
         user_email = user_to_delete.get('email')
         if not user_email:
-            return jsonify({'error': 'User email not found'}), 404
+            return ojsonify({'error': 'User email not found'}), 404
 
-        # Track deletion statistics
-        deleted_challenges = 0
-        deleted_trades = 0
-        deleted_posts = 0
+        # 1. Delete all challenges, their trades and the user's community posts
+        bulk_challenges, bulk_trades, bulk_posts = await bulk_delete_user_data(user_email, base44_client)
+        fallback_counts = (0, 0, 0)
+        if bulk_challenges is None or bulk_posts is None:
+            # Per-record deletes for the types bulk deletion couldn't handle; the challenge
+            # cascade also removes any trades that are still there
+            fallback_counts = await delete_user_data_concurrently(
+                user_email, base44_client,
+                include_challenges=bulk_challenges is None,
+                include_posts=bulk_posts is None
+            )
+        deleted_challenges, deleted_trades, deleted_posts = (
+            (bulk or 0) + fallback
+            for bulk, fallback in zip((bulk_challenges, bulk_trades, bulk_posts), fallback_counts)
+        )
 
-        # 1. Delete all challenges and their trades
-        challenges = await base44_client.filter_challenges({'user_email': user_email})
-        
-        for challenge in challenges:
-            # Delete all trades for this challenge
-            trades = await base44_client.filter_trades({'challenge_id': challenge['id']})
-            for trade in trades:
-                success = await base44_client.delete_trade(trade['id'])
-                if success:
-                    deleted_trades += 1
-            
-            # Delete the challenge
-            success = await base44_client.delete_challenge(challenge['id'])
-            if success:
-                deleted_challenges += 1
-
-        # 2. Delete all community posts
-        posts = await base44_client.filter_community_posts({'author_email': user_email})
-        for post in posts:
-            success = await base44_client.delete_community_post(post['id'])
-            if success:
-                deleted_posts += 1
-
-        # 3. Finally, delete the user
-        user_deleted = await base44_client.delete_user(user_id)
+        # 2. Finally, delete the user
+        user_deleted = await delete_with_retry(functools.partial(base44_client.delete_user, user_id))
         if not user_deleted:
-            return jsonify({
+            return ojsonify({
                 'error': 'Failed to delete user',
                 'success': False
             }), 500
 
-        return jsonify({
+        return ojsonify({
             'success': True,
             'message': 'User and all related data deleted successfully',
             'deleted_data': {
@@ -207,60 +346,134 @@ async def delete_user():
             }
         })
 
-    except json.JSONDecodeError:
-        return jsonify({
-            'error': 'Invalid JSON in request body'
-        }), 400
-    
     except KeyError as e:
-        return jsonify({
+        return ojsonify({
             'error': f'Missing required field: {str(e)}'
         }), 400
     
     except Exception as error:
         logging.error(f'Error deleting user: {error}', exc_info=True)
-        return jsonify({
+        return ojsonify({
             'error': str(error)
         }), 500
 
+async def bulk_delete_user_data(user_email: str, base44_client: Base44Client):
+    """Delete user data server-side with bulk requests
+    
+    Returns (challenges, trades, posts) deleted counts. Challenges are None when
+    they could not be bulk deleted, including when any of their trades could not
+    be; the per-record cascade then removes what is left. Posts are None when
+    they could not be bulk deleted.
+    """
+    # Trades are found by challenge elsewhere, so they are deleted the same way here
+    challenges, deleted_posts = await asyncio.gather(
+        base44_client.filter_challenges({'user_email': user_email}),
+        base44_client.bulk_delete('CommunityPost', {'author_email': user_email})
+    )
+    trade_counts = await asyncio.gather(*(
+        base44_client.bulk_delete('Trade', {'challenge_id': challenge['id']})
+        for challenge in challenges
+    ))
+    deleted_trades = sum(count for count in trade_counts if count is not None)
+    
+    # Challenges go last, and only once all their trades are gone, so no trade is orphaned
+    if None in trade_counts:
+        deleted_challenges = None
+    elif challenges:
+        deleted_challenges = await base44_client.bulk_delete('Challenge', {'user_email': user_email})
+    else:
+        deleted_challenges = 0
+    
+    return deleted_challenges, deleted_trades, deleted_posts
+
+async def delete_with_retry(coro_factory: Callable[[], Awaitable[bool]], attempts: int = DELETE_ATTEMPTS) -> bool:
+    """Run a delete, retrying transient HTTP failures with exponential backoff"""
+    for attempt in range(attempts):
+        try:
+            return await coro_factory()
+        except (httpx.HTTPStatusError, httpx.TransportError) as error:
+            if attempt == attempts - 1:
+                logging.warning(f'Giving up on delete after {attempts} attempts: {error}')
+                return False
+            await asyncio.sleep(0.1 * 2 ** attempt)
+    return False
+
+async def count_deleted(tasks: Iterable[Awaitable[bool]]) -> int:
+    """Count successful deletes in completion order"""
+    # as_completed lets a retry back off while the other deletes keep running
+    deleted = 0
+    for future in asyncio.as_completed(list(tasks)):
+        if await future:
+            deleted += 1
+    return deleted
+
 # Helper function for batch deletion
-async def delete_user_data_concurrently(user_email: str, base44_client: Base44Client):
-    """Delete user data concurrently for better performance"""
-    import asyncio
+async def delete_user_data_concurrently(user_email: str, base44_client: Base44Client,
+                                        include_challenges: bool = True, include_posts: bool = True):
+    """Delete user data concurrently for better performance
     
+    include_challenges covers challenges and their trades; a type left out
+    counts as nothing deleted.
+    """
     # Get all data first
-    challenges_task = base44_client.filter_challenges({'user_email': user_email})
-    posts_task = base44_client.filter_community_posts({'author_email': user_email})
+    challenges_task = (base44_client.filter_challenges({'user_email': user_email})
+                       if include_challenges else asyncio.sleep(0, result=[]))
+    posts_task = (base44_client.filter_community_posts({'author_email': user_email})
+                  if include_posts else asyncio.sleep(0, result=[]))
     
     challenges, posts = await asyncio.gather(challenges_task, posts_task)
     
-    # Delete trades for each challenge
-    trade_deletion_tasks = []
-    for challenge in challenges:
-        trades = await base44_client.filter_trades({'challenge_id': challenge['id']})
-        for trade in trades:
-            trade_deletion_tasks.append(base44_client.delete_trade(trade['id']))
+    # Common case of a user with no content: nothing left but the user itself
+    if not challenges and not posts:
+        return 0, 0, 0
     
-    # Wait for all trade deletions
-    trade_results = await asyncio.gather(*trade_deletion_tasks, return_exceptions=True)
-    deleted_trades = sum(1 for result in trade_results if result is True)
+    async def purge_challenge(challenge):
+        """Delete a challenge as soon as its own trades are gone"""
+        # Start deleting each trade as soon as it is parsed off the filter stream
+        trade_tasks = [
+            asyncio.create_task(delete_with_retry(functools.partial(base44_client.delete_trade, trade['id'])))
+            async for trade in base44_client.filter_trades({'challenge_id': challenge['id']})
+        ]
+        deleted_trades = await count_deleted(trade_tasks) if trade_tasks else 0
+        challenge_deleted = await delete_with_retry(functools.partial(base44_client.delete_challenge, challenge['id']))
+        return challenge_deleted, deleted_trades
     
-    # Delete challenges
-    challenge_deletion_tasks = [base44_client.delete_challenge(c['id']) for c in challenges]
-    challenge_results = await asyncio.gather(*challenge_deletion_tasks, return_exceptions=True)
-    deleted_challenges = sum(1 for result in challenge_results if result is True)
+    async def purge_challenges():
+        deleted_challenges = deleted_trades = 0
+        for future in asyncio.as_completed([purge_challenge(c) for c in challenges]):
+            challenge_deleted, trade_count = await future
+            deleted_challenges += challenge_deleted
+            deleted_trades += trade_count
+        return deleted_challenges, deleted_trades
     
-    # Delete posts
-    post_deletion_tasks = [base44_client.delete_community_post(p['id']) for p in posts]
-    post_results = await asyncio.gather(*post_deletion_tasks, return_exceptions=True)
-    deleted_posts = sum(1 for result in post_results if result is True)
+    # Posts do not depend on challenges, so both cascades run side by side
+    # Only branches with something to delete are scheduled
+    (deleted_challenges, deleted_trades), deleted_posts = await asyncio.gather(
+        purge_challenges() if challenges else asyncio.sleep(0, result=(0, 0)),
+        count_deleted(
+            delete_with_retry(functools.partial(base44_client.delete_community_post, p['id']))
+            for p in posts
+        ) if posts else asyncio.sleep(0, result=0)
+    )
     
     return deleted_challenges, deleted_trades, deleted_posts
 
+@app.before_serving
+async def open_http_client():
+    base44_client._get_client()
+
+@app.after_serving
+async def close_http_client():
+    await base44_client.close()
+
+@app.after_serving
+async def stop_log_listener():
+    log_listener.stop()
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
-def health_check():
-    return jsonify({
+async def health_check():
+    return ojsonify({
         'status': 'healthy',
         'service': 'user_deletion_service'
     }), 200
@@ -269,5 +482,9 @@ if __name__ == '__main__':
     if not BASE44_API_KEY:
         logging.warning("BASE44_API_KEY environment variable is not set")
     
-    port = int(os.environ.get('PORT', 3009))
-    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG', 'False').lower() == 'true')
\ No newline at end of file
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    
+    config = Config()
+    config.bind = [f"0.0.0.0:{int(os.environ.get('PORT', 3009))}"]
+    asyncio.run(serve(app, config))
\ No newline at end of file
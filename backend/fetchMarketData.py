@@ -1,17 +1,270 @@
-from flask import Flask, request, jsonify
+from quart import Quart, Response, request
 import os
 import logging
-import random
 import time
+import asyncio
+import functools
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
 import json
-
-app = Flask(__name__)
+import aiohttp
+import numpy as np
+import orjson
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # caching is optional
+    aioredis = None
+
+try:
+    from aiohttp_client_cache import CachedSession, RedisBackend
+except ImportError:  # HTTP-level caching is optional
+    CachedSession = None
+
+try:
+    import ciso8601
+    parse_iso_datetime = ciso8601.parse_datetime
+except ImportError:  # pure-Python fallback; fromisoformat only takes 'Z' from 3.11
+    def parse_iso_datetime(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+try:
+    import simdjson
+    _json_parser = simdjson.Parser()
+except ImportError:  # no wheel for this platform, orjson parses everything
+    simdjson = None
+
+# Serve with an ASGI server so concurrent fetches share one event loop:
+#   hypercorn fetchMarketData:app --bind 0.0.0.0:3010 --workers 4
+app = Quart(__name__)
 logging.basicConfig(level=logging.INFO)
 
+def _encode_default(obj: Any) -> Any:
+    if isinstance(obj, PriceSeries):
+        return obj.bars()
+    raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+def ojsonify(obj: Any) -> Response:
+    """Build a JSON response serialized with orjson"""
+    return Response(orjson.dumps(obj, default=_encode_default, option=orjson.OPT_NON_STR_KEYS), mimetype='application/json')
+
+# Bars encoded per streamed chunk
+STREAM_BATCH_BARS = 64
+
+def stream_market_data(data: Dict[str, Any]) -> Response:
+    """Stream a market data payload, sending priceData in batches as it is encoded"""
+    def generate():
+        head = orjson.dumps({key: value for key, value in data.items() if key != 'priceData'})
+        yield head[:-1] + (b',"priceData":[' if len(head) > 2 else b'"priceData":[')
+        series = data['priceData']
+        for start in range(0, len(series), STREAM_BATCH_BARS):
+            # Strip the brackets so consecutive batches join into one array
+            batch = orjson.dumps(series.bars(start, start + STREAM_BATCH_BARS))[1:-1]
+            yield batch if start == 0 else b',' + batch
+        yield b']}'
+    return Response(generate(), mimetype='application/json')
+
 BASE44_API_KEY = os.environ.get('BASE44_API_KEY')
 BASE44_API_URL = os.environ.get('BASE44_API_URL', 'https://api.base44.com')
+REDIS_URL = os.environ.get('REDIS_URL')
+
+# Bars only change once per interval, so cached results live that long
+INTERVAL_TTLS = {'1m': 60, '5m': 300, '60m': 3600, '1d': 3600}
+# Parts of a Yahoo chart result the fetchers read; the rest is never decoded
+YAHOO_CHART_FIELDS = ('timestamp', 'indicators', 'meta')
+# After a Redis failure, go straight to the upstream APIs for this many seconds
+REDIS_RETRY_AFTER = 30
+# Generated fallback candles are only cached briefly, so real data returns soon after an upstream error
+FALLBACK_TTL = 15
+
+# Crypto symbols need special formatting for Yahoo Finance
+_CRYPTO_MAP = {
+    'BTCUSD': 'BTC-USD',
+    'ETHUSD': 'ETH-USD',
+    'SOLUSD': 'SOL-USD',
+    'BNBUSD': 'BNB-USD',
+    'XRPUSD': 'XRP-USD',
+    'ADAUSD': 'ADA-USD',
+    'DOGEUSD': 'DOGE-USD',
+    'MATICUSD': 'MATIC-USD'
+}
+
+_CHART_URL_TMPL = "https://query2.finance.yahoo.com/v8/finance/chart/{sym}?interval={iv}&range=1d"
+_QUOTE_URL_TMPL = "https://query1.finance.yahoo.com/v7/finance/quote?symbols={sym}"
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'application/json',
+}
+
+# Only upstream market data is cached at the HTTP layer, never Base44 auth calls
+_CACHEABLE_HOSTS = frozenset({'query1.finance.yahoo.com', 'query2.finance.yahoo.com', 'api.investing.com'})
+_REDIS_ERRORS = (aioredis.RedisError,) if aioredis is not None else ()
+
+# Cap on in-flight Yahoo/Investing calls, kept within Yahoo's per-IP rate budget
+MAX_UPSTREAM_REQUESTS = 16
+
+# Shared across fetches so Yahoo/Investing connections are kept alive and reused
+SESSION: Optional[aiohttp.ClientSession] = None
+# Plain session on SESSION's connector, for requests that must skip the HTTP cache
+_UNCACHED_SESSION: Optional[aiohttp.ClientSession] = None
+_SESSION_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_YF_SEM: Optional[asyncio.Semaphore] = None
+
+async def get_session() -> aiohttp.ClientSession:
+    """Get the shared HTTP session, creating it on first use
+    
+    A session is tied to the event loop it was created on, so a new one is
+    opened whenever the running loop changes, along with the semaphore that
+    bounds upstream concurrency on that loop.
+    """
+    global SESSION, _UNCACHED_SESSION, _SESSION_LOOP, _YF_SEM
+    loop = asyncio.get_running_loop()
+    if SESSION is None or SESSION.closed or _SESSION_LOOP is not loop:
+        connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=10)
+        if CachedSession is not None and aioredis is not None and REDIS_URL:
+            # Honors upstream Cache-Control; concurrent identical GETs are not merged,
+            # each misses and goes upstream until one response is stored
+            SESSION = CachedSession(cache=RedisBackend(
+                'yf', address=REDIS_URL, expire_after=60, cache_control=True,
+                filter_fn=lambda response: response.url.host in _CACHEABLE_HOSTS
+            ), connector=connector, timeout=timeout)
+            _UNCACHED_SESSION = aiohttp.ClientSession(connector=connector, connector_owner=False, timeout=timeout)
+        else:
+            SESSION = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            _UNCACHED_SESSION = None
+        _SESSION_LOOP = loop
+        _YF_SEM = asyncio.Semaphore(MAX_UPSTREAM_REQUESTS)
+    return SESSION
+
+async def close_session():
+    """Close the shared HTTP session"""
+    global SESSION, _UNCACHED_SESSION
+    if _UNCACHED_SESSION is not None and not _UNCACHED_SESSION.closed:
+        await _UNCACHED_SESSION.close()
+    if SESSION is not None and not SESSION.closed:
+        await SESSION.close()
+    SESSION = _UNCACHED_SESSION = None
+
+async def _get_ok_body(session: aiohttp.ClientSession, url: str) -> Optional[bytes]:
+    async with session.get(url, headers=HEADERS) as response:
+        return await response.read() if response.status == 200 else None
+
+async def fetch_upstream(url: str) -> Optional[bytes]:
+    """GET a Yahoo/Investing URL, returning the body of a 200 response"""
+    session = await get_session()
+    async with _YF_SEM:
+        # Bypass the HTTP cache while the Redis breaker is open; switching sessions per call
+        # leaves the shared cache's state alone for concurrent requests
+        if _UNCACHED_SESSION is None or time.monotonic() < _redis_down_until:
+            return await _get_ok_body(_UNCACHED_SESSION or session, url)
+        try:
+            return await _get_ok_body(session, url)
+        except _REDIS_ERRORS as error:
+            _trip_redis_breaker(error)
+            return await _get_ok_body(_UNCACHED_SESSION, url)
+
+_redis_client = None
+_REDIS_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_redis_down_until = 0.0
+
+def get_redis():
+    """Get the Redis client, or None while caching is disabled or Redis is failing"""
+    global _redis_client, _REDIS_LOOP
+    if aioredis is None or not REDIS_URL or time.monotonic() < _redis_down_until:
+        return None
+    loop = asyncio.get_running_loop()
+    if _redis_client is None or _REDIS_LOOP is not loop:
+        _redis_client = aioredis.from_url(REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+        _REDIS_LOOP = loop
+    return _redis_client
+
+async def close_redis():
+    """Close the Redis connection pool"""
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.aclose()
+    _redis_client = None
+
+def _trip_redis_breaker(error: Exception):
+    global _redis_down_until
+    logging.warning(f'Redis unavailable, bypassing cache for {REDIS_RETRY_AFTER}s: {error}')
+    _redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+
+def _cache_default(obj: Any) -> Any:
+    if isinstance(obj, PriceSeries):
+        return obj.to_columns()
+    raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+def cached(ttl):
+    """Cache a fetcher's result in Redis, keyed on its arguments
+    
+    ttl is a number of seconds, or a callable computing it from the arguments.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args):
+            client = get_redis()
+            if client is None:
+                return await func(*args)
+            
+            key = ':'.join(('market_data', func.__name__, *map(str, args)))
+            try:
+                hit = await client.get(key)
+            except (aioredis.RedisError, OSError) as error:
+                _trip_redis_breaker(error)
+                return await func(*args)
+            if hit:
+                result = orjson.loads(hit)
+                if isinstance(result.get('priceData'), dict):
+                    result['priceData'] = PriceSeries.from_columns(result['priceData'])
+                return result
+            
+            result = await func(*args)
+            if isinstance(result, GeneratedMarketData):
+                expires = FALLBACK_TTL
+            else:
+                expires = ttl(*args) if callable(ttl) else ttl
+            try:
+                payload = orjson.dumps(result, default=_cache_default)
+                await client.setex(key, expires, payload)
+            except (aioredis.RedisError, OSError) as error:
+                _trip_redis_breaker(error)
+            return result
+        return wrapper
+    return decorator
+
+def _materialize(value: Any) -> Any:
+    if isinstance(value, simdjson.Object):
+        return value.as_dict()
+    if isinstance(value, simdjson.Array):
+        return value.as_list()
+    return value
+
+def load_yahoo_json(raw: bytes) -> Dict[str, Any]:
+    """Decode a Yahoo chart or quote payload
+    
+    With simdjson only the first chart/quote result is turned into Python
+    objects, and nothing that references the shared parser outlives the call.
+    """
+    if simdjson is None:
+        return orjson.loads(raw)
+    try:
+        doc = _json_parser.parse(raw)
+    except RuntimeError:
+        # Parser still pinned by a document from an interrupted decode
+        return orjson.loads(raw)
+    
+    payload: Dict[str, Any] = {}
+    chart_results = doc.get('chart', {}).get('result')
+    if chart_results:
+        first = chart_results[0]
+        payload['chart'] = {'result': [{key: _materialize(first[key]) for key in YAHOO_CHART_FIELDS if key in first}]}
+    quote_results = doc.get('quoteResponse', {}).get('result')
+    if quote_results:
+        payload['quoteResponse'] = {'result': [_materialize(quote_results[0])]}
+    return payload
 
 class Base44Client:
     def __init__(self, api_key: str, base_url: str):
@@ -24,216 +277,253 @@ class Base44Client:
         if not auth_header:
             return None
         
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{self.base_url}/auth/me",
-                headers={"Authorization": auth_header}
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                return None
+        session = await get_session()
+        async with session.get(
+            f"{self.base_url}/auth/me",
+            headers={"Authorization": auth_header}
+        ) as response:
+            if response.status == 200:
+                return orjson.loads(await response.read())
+            return None
 
 base44_client = Base44Client(
     api_key=BASE44_API_KEY,
     base_url=BASE44_API_URL
 )
 
+OHLC_FIELDS = ('open', 'high', 'low', 'close')
+BAR_FIELDS = ('time', *OHLC_FIELDS, 'volume')
+
+class PriceSeries:
+    """OHLC bars held as parallel columns
+    
+    Per-bar dicts are only built while a response is being encoded.
+    """
+    __slots__ = BAR_FIELDS
+    
+    def __init__(self, times: List[int], opens: List[float], highs: List[float],
+                 lows: List[float], closes: List[float], volumes: List[float]):
+        self.time = times
+        self.open = opens
+        self.high = highs
+        self.low = lows
+        self.close = closes
+        self.volume = volumes
+    
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List[Any]]) -> 'PriceSeries':
+        return cls(*(columns[field] for field in BAR_FIELDS))
+    
+    def __len__(self) -> int:
+        return len(self.close)
+    
+    def columns(self) -> tuple:
+        return self.time, self.open, self.high, self.low, self.close, self.volume
+    
+    def to_columns(self) -> Dict[str, List[Any]]:
+        return dict(zip(BAR_FIELDS, self.columns()))
+    
+    def bars(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Build the API's bar dicts for a slice of the series"""
+        return [
+            dict(zip(BAR_FIELDS, bar))
+            for bar in zip(*(column[start:stop] for column in self.columns()))
+        ]
+
+def build_price_data(timestamps: List[int], quotes: Dict[str, List[Optional[float]]]) -> PriceSeries:
+    """Turn Yahoo's parallel quote arrays into OHLC bars, skipping bars without a close"""
+    n = min(len(timestamps), *(len(quotes.get(field, [])) for field in OHLC_FIELDS))
+    if n == 0:
+        return PriceSeries([], [], [], [], [], [])
+    
+    # None becomes NaN on conversion, then 0 like the API's missing values
+    times = np.asarray(timestamps[:n], dtype=np.int64) * 1000
+    opens, highs, lows, closes = (
+        np.nan_to_num(np.asarray(quotes[field][:n], dtype=np.float64)) for field in OHLC_FIELDS
+    )
+    volumes = np.zeros(n, dtype=np.int64)
+    raw_volumes = (quotes.get('volume') or [])[:n]
+    volumes[:len(raw_volumes)] = np.nan_to_num(np.asarray(raw_volumes, dtype=np.float64))
+    
+    mask = closes > 0
+    return PriceSeries(*(column[mask].tolist() for column in (times, opens, highs, lows, closes, volumes)))
+
+async def _try_endpoint(url: str, symbol: str, yfinance_symbol: str, market: str) -> Optional[Dict[str, Any]]:
+    """Fetch and parse one Yahoo Finance endpoint, returning None if it has nothing usable"""
+    try:
+        raw = await fetch_upstream(url)
+        if raw is not None:
+            json_data = load_yahoo_json(raw)
+            
+            # Handle chart API response
+            if json_data.get('chart', {}).get('result', []):
+                result = json_data['chart']['result'][0]
+                timestamps = result.get('timestamp', [])
+                quotes = result.get('indicators', {}).get('quote', [{}])[0]
+                
+                price_data = build_price_data(timestamps, quotes)
+
+                if price_data:
+                    current_price = price_data.close[-1]
+                    previous_close = result.get('meta', {}).get('chartPreviousClose', price_data.close[0])
+                    change = current_price - previous_close
+                    change_percent = (change / previous_close * 100) if previous_close > 0 else 0
+
+                    return {
+                        'symbol': yfinance_symbol,
+                        'currentPrice': current_price,
+                        'change': change,
+                        'changePercent': change_percent,
+                        'priceData': price_data,
+                        'market': market
+                    }
+            
+            # Handle quote API response
+            if json_data.get('quoteResponse', {}).get('result', []):
+                quote = json_data['quoteResponse']['result'][0]
+                current_price = quote.get('regularMarketPrice', 0)
+                previous_close = quote.get('regularMarketPreviousClose', current_price)
+                change = quote.get('regularMarketChange', 0)
+                change_percent = quote.get('regularMarketChangePercent', 0)
+                
+                # Generate historical data from current price
+                return generate_realistic_historical_data(symbol, market, current_price, change_percent)
+    except Exception as e:
+        logging.error(f'Endpoint {url} failed: {e}')
+    return None
+
+@cached(ttl=INTERVAL_TTLS['5m'])
 async def fetch_yfinance_data(symbol: str, market: str) -> Dict[str, Any]:
     """Fetch data from Yahoo Finance API"""
     # Format symbol for yfinance
-    yfinance_symbol = symbol
-    
-    if market == 'crypto':
-        # Crypto symbols need special formatting for Yahoo Finance
-        crypto_map = {
-            'BTCUSD': 'BTC-USD',
-            'ETHUSD': 'ETH-USD',
-            'SOLUSD': 'SOL-USD',
-            'BNBUSD': 'BNB-USD',
-            'XRPUSD': 'XRP-USD',
-            'ADAUSD': 'ADA-USD',
-            'DOGEUSD': 'DOGE-USD',
-            'MATICUSD': 'MATIC-USD'
-        }
-        yfinance_symbol = crypto_map.get(symbol, symbol)
+    yfinance_symbol = _CRYPTO_MAP.get(symbol, symbol) if market == 'crypto' else symbol
 
     try:
-        # Try multiple Yahoo Finance API endpoints
-        endpoints = [
-            f"https://query2.finance.yahoo.com/v8/finance/chart/{yfinance_symbol}?interval=5m&range=1d",
-            f"https://query1.finance.yahoo.com/v7/finance/quote?symbols={yfinance_symbol}",
-        ]
-
-        import aiohttp
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'application/json',
-        }
-
-        for url in endpoints:
+        # Start both endpoints at once so a chart failure doesn't wait out a second round trip,
+        # but prefer the chart's real bars; the quote only seeds generated candles
+        chart_task = asyncio.create_task(
+            _try_endpoint(_CHART_URL_TMPL.format(sym=yfinance_symbol, iv='5m'), symbol, yfinance_symbol, market)
+        )
+        quote_task = asyncio.create_task(
+            _try_endpoint(_QUOTE_URL_TMPL.format(sym=yfinance_symbol), symbol, yfinance_symbol, market)
+        )
+        try:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            json_data = await response.json()
-                            
-                            # Handle chart API response
-                            if json_data.get('chart', {}).get('result', []):
-                                result = json_data['chart']['result'][0]
-                                timestamps = result.get('timestamp', [])
-                                quotes = result.get('indicators', {}).get('quote', [{}])[0]
-                                
-                                price_data = []
-                                for i, timestamp in enumerate(timestamps):
-                                    if (i < len(quotes.get('open', [])) and 
-                                        i < len(quotes.get('high', [])) and 
-                                        i < len(quotes.get('low', [])) and 
-                                        i < len(quotes.get('close', []))):
-                                        
-                                        close_price = quotes['close'][i]
-                                        if close_price and close_price > 0:
-                                            price_data.append({
-                                                'time': timestamp * 1000,
-                                                'open': quotes['open'][i] or 0,
-                                                'high': quotes['high'][i] or 0,
-                                                'low': quotes['low'][i] or 0,
-                                                'close': close_price,
-                                                'volume': quotes.get('volume', [0])[i] or 0
-                                            })
-
-                                if price_data:
-                                    current_price = price_data[-1]['close']
-                                    previous_close = result.get('meta', {}).get('chartPreviousClose', price_data[0]['close'])
-                                    change = current_price - previous_close
-                                    change_percent = (change / previous_close * 100) if previous_close > 0 else 0
-
-                                    return {
-                                        'symbol': yfinance_symbol,
-                                        'currentPrice': current_price,
-                                        'change': change,
-                                        'changePercent': change_percent,
-                                        'priceData': price_data,
-                                        'market': market
-                                    }
-                            
-                            # Handle quote API response
-                            if json_data.get('quoteResponse', {}).get('result', []):
-                                quote = json_data['quoteResponse']['result'][0]
-                                current_price = quote.get('regularMarketPrice', 0)
-                                previous_close = quote.get('regularMarketPreviousClose', current_price)
-                                change = quote.get('regularMarketChange', 0)
-                                change_percent = quote.get('regularMarketChangePercent', 0)
-                                
-                                # Generate historical data from current price
-                                return generate_realistic_historical_data(symbol, market, current_price, change_percent)
-                                
-            except Exception as e:
-                logging.error(f'Endpoint {url} failed: {e}')
-                continue
+                result = await chart_task
+            except Exception as error:
+                logging.error(f'Chart endpoint failed: {error}')
+                result = None
+            if result is None:
+                result = await quote_task
+            if result is not None:
+                return result
+        finally:
+            quote_task.cancel()
 
     except Exception as error:
         logging.error(f'All Yahoo Finance endpoints failed: {error}')
 
-    
-    base_price = current_price or base_prices.get(symbol, 100)
+    # Fallback to generated data
+    return generate_realistic_historical_data(symbol, market)
+
+# Reference prices for generated data when no live quote is available
+BASE_PRICES = {
+    'BTCUSD': 65000, 'ETHUSD': 3500, 'SOLUSD': 150, 'BNBUSD': 580,
+    'XRPUSD': 0.55, 'ADAUSD': 0.45, 'DOGEUSD': 0.15, 'MATICUSD': 0.7,
+    'AAPL': 190, 'TSLA': 250, 'GOOGL': 170, 'MSFT': 420, 'NVDA': 120,
+    'IAM': 100, 'ATW': 480, 'BCP': 280, 'LBV': 4000, 'CDM': 700
+}
+
+class GeneratedMarketData(dict):
+    """A market data payload made up by generate_realistic_historical_data, not fetched"""
+
+def generate_realistic_historical_data(symbol: str, market: str, current_price: Optional[float] = None,
+                                       change_percent: Optional[float] = None) -> Dict[str, Any]:
+    """Generate a day of realistic 5-minute candles ending at the current price"""
+    base_price = current_price or BASE_PRICES.get(symbol, 100)
     volatility = 0.015 if market == 'crypto' else 0.008
     
     # Generate 78 data points (1 day of 5-minute intervals)
-    price_data = []
+    bars = 78
+    rng = np.random.default_rng()
     now = int(time.time() * 1000)
-    price = base_price * 0.995  # Start slightly lower
     
-    for i in range(78, 0, -1):
-        variance = (random.random() - 0.5) * base_price * volatility
-        price = max(price + variance, base_price * 0.9)
-        
-        open_price = price
-        high_price = price + random.random() * base_price * volatility * 0.5
-        low_price = price - random.random() * base_price * volatility * 0.5
-        close_price = low_price + random.random() * (high_price - low_price)
-        
-        price_data.append({
-            'time': now - i * 300000,  # 5-minute intervals
-            'open': open_price,
-            'high': high_price,
-            'low': low_price,
-            'close': close_price,
-            'volume': random.randint(100000, 1100000)
-        })
+    # Random walk from slightly below the base price that never drops under 90% of it:
+    # reflecting the running sum at the floor is max(p + variance, floor) applied step by step
+    floor = base_price * 0.9
+    walk = base_price * 0.995 + np.cumsum((rng.random(bars) - 0.5) * base_price * volatility)
+    prices = walk + np.maximum.accumulate(np.maximum(floor - walk, 0))
+    
+    spread = base_price * volatility * 0.5
+    highs = prices + rng.random(bars) * spread
+    lows = prices - rng.random(bars) * spread
+    closes = lows + rng.random(bars) * (highs - lows)
+    times = now - np.arange(bars, 0, -1) * 300000  # 5-minute intervals
+    volumes = rng.integers(100000, 1100000, size=bars, endpoint=True)
     
     # Add current price as final candle
-    last_price = price_data[-1]['close'] if price_data else base_price
-    price_data.append({
-        'time': now,
-        'open': last_price,
-        'high': max(last_price, base_price),
-        'low': min(last_price, base_price),
-        'close': base_price,
-        'volume': random.randint(100000, 1100000)
-    })
+    last_price = float(closes[-1])
+    price_data = PriceSeries(
+        times.tolist() + [now],
+        prices.tolist() + [last_price],
+        highs.tolist() + [max(last_price, base_price)],
+        lows.tolist() + [min(last_price, base_price)],
+        closes.tolist() + [base_price],
+        volumes.tolist() + [int(rng.integers(100000, 1100000, endpoint=True))]
+    )
 
     final_price = base_price
-    start_price = price_data[0]['close'] if price_data else final_price
+    start_price = price_data.close[0]
     actual_change = final_price - start_price
     actual_change_percent = (actual_change / start_price * 100) if start_price > 0 else 0
 
-    return {
+    return GeneratedMarketData({
         'symbol': symbol,
         'currentPrice': final_price,
         'change': actual_change,
         'changePercent': change_percent or actual_change_percent,
         'priceData': price_data,
         'market': market
-    }
+    })
 
+@cached(ttl=INTERVAL_TTLS['5m'])
 async def fetch_moroccan_market_data(symbol: str) -> Dict[str, Any]:
     """Fetch Moroccan market data"""
     try:
         # Try fetching from alternative API sources
-        import aiohttp
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'application/json'
-        }
-        
         # Try investing.com API for Moroccan stocks
         url = f"https://api.investing.com/api/financialdata/{symbol}/historical/chart/?period=P1D&interval=PT5M&pointscount=120"
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data and data.get('data') and len(data['data']) > 0:
-                        price_data = []
-                        for item in data['data']:
-                            try:
-                                timestamp = int(datetime.fromisoformat(item['date'].replace('Z', '+00:00')).timestamp() * 1000)
-                                price_data.append({
-                                    'time': timestamp,
-                                    'open': item['open'],
-                                    'high': item['high'],
-                                    'low': item['low'],
-                                    'close': item['close'],
-                                    'volume': item.get('volume', 0)
-                                })
-                            except (KeyError, ValueError):
-                                continue
-
-                        if price_data:
-                            current_price = price_data[-1]['close']
-                            previous_close = price_data[0]['close']
-                            change = current_price - previous_close
-                            change_percent = (change / previous_close * 100) if previous_close > 0 else 0
-
-                            return {
-                                'symbol': symbol,
-                                'currentPrice': current_price,
-                                'change': change,
-                                'changePercent': change_percent,
-                                'priceData': price_data,
-                                'market': 'morocco'
-                            }
+        raw = await fetch_upstream(url)
+        if raw is not None:
+            data = orjson.loads(raw)
+            if data and data.get('data') and len(data['data']) > 0:
+                bars = []
+                for item in data['data']:
+                    try:
+                        timestamp = int(parse_iso_datetime(item['date']).timestamp() * 1000)
+                        bars.append((
+                            timestamp, item['open'], item['high'],
+                            item['low'], item['close'], item.get('volume', 0)
+                        ))
+                    except (KeyError, ValueError):
+                        continue
+
+                if bars:
+                    price_data = PriceSeries(*(list(column) for column in zip(*bars)))
+                    current_price = price_data.close[-1]
+                    previous_close = price_data.close[0]
+                    change = current_price - previous_close
+                    change_percent = (change / previous_close * 100) if previous_close > 0 else 0
+
+                    return {
+                        'symbol': symbol,
+                        'currentPrice': current_price,
+                        'change': change,
+                        'changePercent': change_percent,
+                        'priceData': price_data,
+                        'market': 'morocco'
+                    }
     except Exception as error:
         logging.error(f'Investing.com API failed: {error}')
 
@@ -250,17 +540,17 @@ async def fetch_market_data():
         # Optional authentication - uncomment if needed
         # user = await base44_client.get_user_from_request(request)
         # if not user:
-        #     return jsonify({'error': 'Unauthorized'}), 401
+        #     return ojsonify({'error': 'Unauthorized'}), 401
 
-        data = request.get_json()
+        data = await request.get_json()
         if not data:
-            return jsonify({'error': 'Invalid JSON data'}), 400
+            return ojsonify({'error': 'Invalid JSON data'}), 400
 
         symbol = data.get('symbol')
         market = data.get('market')
         
         if not symbol or not market:
-            return jsonify({'error': 'Symbol and market are required'}), 400
+            return ojsonify({'error': 'Symbol and market are required'}), 400
 
         # Fetch data based on market type
         if market in ['crypto', 'us_stock']:
@@ -268,31 +558,31 @@ async def fetch_market_data():
         elif market == 'morocco':
             data_result = await fetch_moroccan_market_data(symbol)
         else:
-            return jsonify({'error': 'Invalid market type'}), 400
+            return ojsonify({'error': 'Invalid market type'}), 400
 
-        return jsonify(data_result)
+        return stream_market_data(data_result)
 
     except json.JSONDecodeError:
-        return jsonify({'error': 'Invalid JSON in request body'}), 400
+        return ojsonify({'error': 'Invalid JSON in request body'}), 400
     
     except Exception as error:
         logging.error(f'Error fetching market data: {error}', exc_info=True)
-        return jsonify({'error': str(error)}), 500
+        return ojsonify({'error': str(error)}), 500
 
 # Additional endpoints for different data intervals
 @app.route('/fetch_market_data/<interval>', methods=['POST'])
 async def fetch_market_data_interval(interval: str):
     """Fetch market data with specific interval (1m, 5m, 1h, 1d)"""
     try:
-        data = request.get_json()
+        data = await request.get_json()
         if not data:
-            return jsonify({'error': 'Invalid JSON data'}), 400
+            return ojsonify({'error': 'Invalid JSON data'}), 400
 
         symbol = data.get('symbol')
         market = data.get('market')
         
         if not symbol or not market:
-            return jsonify({'error': 'Symbol and market are required'}), 400
+            return ojsonify({'error': 'Symbol and market are required'}), 400
 
         # Map interval to Yahoo Finance parameters
         interval_map = {
@@ -312,83 +602,49 @@ async def fetch_market_data_interval(interval: str):
             base_data = await fetch_moroccan_market_data(symbol)
             data_result = adjust_data_interval(base_data, interval)
         else:
-            return jsonify({'error': 'Invalid market type'}), 400
+            return ojsonify({'error': 'Invalid market type'}), 400
 
-        return jsonify(data_result)
+        return stream_market_data(data_result)
 
     except Exception as error:
         logging.error(f'Error fetching market data with interval {interval}: {error}')
-        return jsonify({'error': str(error)}), 500
+        return ojsonify({'error': str(error)}), 500
 
+@cached(ttl=lambda symbol, market, interval: INTERVAL_TTLS.get(interval, 300))
 async def fetch_yfinance_data_with_interval(symbol: str, market: str, interval: str) -> Dict[str, Any]:
     """Fetch yfinance data with custom interval"""
     try:
-        import aiohttp
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'application/json',
-        }
-        
         # Format symbol
-        yfinance_symbol = symbol
-        if market == 'crypto':
-            crypto_map = {
-                'BTCUSD': 'BTC-USD',
-                'ETHUSD': 'ETH-USD',
-                'SOLUSD': 'SOL-USD',
-                'BNBUSD': 'BNB-USD',
-                'XRPUSD': 'XRP-USD',
-                'ADAUSD': 'ADA-USD',
-                'DOGEUSD': 'DOGE-USD',
-                'MATICUSD': 'MATIC-USD'
-            }
-            yfinance_symbol = crypto_map.get(symbol, symbol)
+        yfinance_symbol = _CRYPTO_MAP.get(symbol, symbol) if market == 'crypto' else symbol
         
-        url = f"https://query2.finance.yahoo.com/v8/finance/chart/{yfinance_symbol}?interval={interval}&range=1d"
+        url = _CHART_URL_TMPL.format(sym=yfinance_symbol, iv=interval)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    json_data = await response.json()
-                    
-                    if json_data.get('chart', {}).get('result', []):
-                        result = json_data['chart']['result'][0]
-                        timestamps = result.get('timestamp', [])
-                        quotes = result.get('indicators', {}).get('quote', [{}])[0]
-                        
-                        price_data = []
-                        for i, timestamp in enumerate(timestamps):
-                            if (i < len(quotes.get('open', [])) and 
-                                i < len(quotes.get('high', [])) and 
-                                i < len(quotes.get('low', [])) and 
-                                i < len(quotes.get('close', []))):
-                                
-                                close_price = quotes['close'][i]
-                                if close_price and close_price > 0:
-                                    price_data.append({
-                                        'time': timestamp * 1000,
-                                        'open': quotes['open'][i] or 0,
-                                        'high': quotes['high'][i] or 0,
-                                        'low': quotes['low'][i] or 0,
-                                        'close': close_price,
-                                        'volume': quotes.get('volume', [0])[i] or 0
-                                    })
-                        
-                        if price_data:
-                            current_price = price_data[-1]['close']
-                            previous_close = result.get('meta', {}).get('chartPreviousClose', price_data[0]['close'])
-                            change = current_price - previous_close
-                            change_percent = (change / previous_close * 100) if previous_close > 0 else 0
-
-                            return {
-                                'symbol': yfinance_symbol,
-                                'currentPrice': current_price,
-                                'change': change,
-                                'changePercent': change_percent,
-                                'priceData': price_data,
-                                'market': market,
-                                'interval': interval
-                            }
+        raw = await fetch_upstream(url)
+        if raw is not None:
+            json_data = load_yahoo_json(raw)
+            
+            if json_data.get('chart', {}).get('result', []):
+                result = json_data['chart']['result'][0]
+                timestamps = result.get('timestamp', [])
+                quotes = result.get('indicators', {}).get('quote', [{}])[0]
+                
+                price_data = build_price_data(timestamps, quotes)
+                
+                if price_data:
+                    current_price = price_data.close[-1]
+                    previous_close = result.get('meta', {}).get('chartPreviousClose', price_data.close[0])
+                    change = current_price - previous_close
+                    change_percent = (change / previous_close * 100) if previous_close > 0 else 0
+
+                    return {
+                        'symbol': yfinance_symbol,
+                        'currentPrice': current_price,
+                        'change': change,
+                        'changePercent': change_percent,
+                        'priceData': price_data,
+                        'market': market,
+                        'interval': interval
+                    }
         
         # Fallback to generated data
         return generate_realistic_historical_data(symbol, market)
@@ -397,6 +653,22 @@ async def fetch_yfinance_data_with_interval(symbol: str, market: str, interval:
         logging.error(f'Error fetching yfinance data with interval: {error}')
         return generate_realistic_historical_data(symbol, market)
 
+def aggregate_ohlc(price_data: PriceSeries, bars_per_bucket: int) -> PriceSeries:
+    """Merge consecutive bars into buckets of bars_per_bucket OHLC bars"""
+    times, opens, highs, lows, closes, volumes = (np.asarray(column) for column in price_data.columns())
+    # Investing can report null volumes, which would leave an object array reduceat can't sum
+    volumes = np.asarray([volume or 0 for volume in price_data.volume])
+    starts = np.arange(0, len(price_data), bars_per_bucket)
+    ends = np.r_[starts[1:] - 1, len(price_data) - 1]
+    return PriceSeries(
+        times[starts].tolist(),
+        opens[starts].tolist(),
+        np.maximum.reduceat(highs, starts).tolist(),
+        np.minimum.reduceat(lows, starts).tolist(),
+        closes[ends].tolist(),
+        np.add.reduceat(volumes, starts).tolist()
+    )
+
 def adjust_data_interval(data: Dict[str, Any], interval: str) -> Dict[str, Any]:
     """Adjust existing data to different interval"""
     if not data.get('priceData'):
@@ -406,17 +678,16 @@ def adjust_data_interval(data: Dict[str, Any], interval: str) -> Dict[str, Any]:
     if len(price_data) < 2:
         return data
     
-    # Simple downsampling for demonstration
-    # In production, use proper OHLC aggregation
-    interval_multiplier = {
+    # Source bars are 5 minutes wide, so each output bar merges this many of them;
+    # intervals finer than the source cannot be rebuilt and are passed through
+    bars_per_bucket = {
         '1m': 1,
-        '5m': 5,
-        '1h': 60,
+        '5m': 1,
+        '1h': 12,
         '1d': 288  # 5-min intervals in a day
-    }.get(interval, 5)
+    }.get(interval, 1)
     
-    # Take every nth data point
-    adjusted_data = price_data[::interval_multiplier]
+    adjusted_data = aggregate_ohlc(price_data, bars_per_bucket) if bars_per_bucket > 1 else price_data
     
     return {
         **data,
@@ -424,10 +695,19 @@ def adjust_data_interval(data: Dict[str, Any], interval: str) -> Dict[str, Any]:
         'interval': interval
     }
 
+@app.before_serving
+async def open_http_session():
+    await get_session()
+
+@app.after_serving
+async def close_http_session():
+    await close_session()
+    await close_redis()
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
-def health_check():
-    return jsonify({
+async def health_check():
+    return ojsonify({
         'status': 'healthy',
         'service': 'market_data_service',
         'timestamp': datetime.utcnow().isoformat()
@@ -443,9 +723,9 @@ async def test_market_data(symbol: str, market: str):
         elif market == 'morocco':
             data = await fetch_moroccan_market_data(symbol)
         else:
-            return jsonify({'error': 'Invalid market type'}), 400
+            return ojsonify({'error': 'Invalid market type'}), 400
         
-        return jsonify({
+        return ojsonify({
             'success': True,
             'symbol': symbol,
             'market': market,
@@ -454,11 +734,15 @@ async def test_market_data(symbol: str, market: str):
             'dataPoints': len(data.get('priceData', []))
         })
     except Exception as error:
-        return jsonify({'error': str(error)}), 500
+        return ojsonify({'error': str(error)}), 500
 
 if __name__ == '__main__':
     if not BASE44_API_KEY:
         logging.warning("BASE44_API_KEY environment variable is not set")
     
-    port = int(os.environ.get('PORT', 3010))
-    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG', 'False').lower() == 'true')
\ No newline at end of file
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    
+    config = Config()
+    config.bind = [f"0.0.0.0:{int(os.environ.get('PORT', 3010))}"]
+    asyncio.run(serve(app, config))
\ No newline at end of file
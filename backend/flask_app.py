@@ -1,26 +1,60 @@
 from flask import Flask, jsonify
+from flask.json.provider import JSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
+from flask_config import Config
+from werkzeug.exceptions import HTTPException
 from datetime import timedelta
+import orjson
 import os
 
-# Initialize extensions
-db = SQLAlchemy()
+# Initialize extensions; sessions are request-scoped, so rows stay loaded after commit
+# instead of being re-SELECTed when the view serializes them
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 jwt = JWTManager()
 migrate = Migrate()
 
+class OrjsonProvider(JSONProvider):
+    """Serialize jsonify() and request JSON with orjson; naive datetimes are emitted as UTC"""
+    option = orjson.OPT_NAIVE_UTC
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.option), mimetype='application/json')
+
 def create_app():
     """Application factory pattern"""
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     
     # Configuration
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'postgresql://localhost/tradesense')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = Config.SQLALCHEMY_ENGINE_OPTIONS
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
+    # HMAC-SHA256 runs on OpenSSL's SHA extensions where the CPU has them
+    app.config['JWT_ALGORITHM'] = 'HS256'
+    
+    # Encode the secret once instead of per signed or verified token
+    jwt_key = app.config['JWT_SECRET_KEY'].encode()
+    
+    @jwt.encode_key_loader
+    def signing_key(identity):
+        return jwt_key
+    
+    @jwt.decode_key_loader
+    def verification_key(jwt_header, jwt_data):
+        return jwt_key
     
     # Initialize extensions with app
     db.init_app(app)
@@ -56,6 +90,14 @@ def create_app():
         db.session.rollback()
         return jsonify({'error': 'Internal server error'}), 500
     
+    # Views don't catch their own failures; HTTP errors keep their status, anything else is a 500
+    @app.errorhandler(Exception)
+    def unhandled_error(error):
+        if isinstance(error, HTTPException):
+            return jsonify({'error': error.description}), error.code
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 500
+    
     return app
 
 if __name__ == '__main__':
@@ -1,186 +1,186 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-from flask_models import User
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt, get_jwt_identity
+from flask_models import User, verify_password
 from flask_app import db
 import re
 
 auth_bp = Blueprint('auth', __name__)
 
+# Profile fields carried in tokens so views can authorize and attribute without loading the user
+USER_CLAIMS = ('role', 'email', 'full_name')
+
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+def user_claims(source):
+    """Pick the token claims out of a user profile"""
+    return {key: source.get(key) for key in USER_CLAIMS}
+
 def validate_email(email):
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user"""
-    try:
-        data = request.get_json()
-        
-        # Validate input
-        email = data.get('email', '').strip().lower()
-        password = data.get('password', '')
-        full_name = data.get('full_name', '').strip()
-        
-        if not email or not validate_email(email):
-            return jsonify({'error': 'Invalid email address'}), 400
-        
-        if not password or len(password) < 6:
-            return jsonify({'error': 'Password must be at least 6 characters'}), 400
-        
-        # Check if user exists
-        if User.query.filter_by(email=email).first():
-            return jsonify({'error': 'Email already registered'}), 409
-        
-        # Create new user
-        user = User(email=email, full_name=full_name)
-        user.set_password(password)
-        
-        db.session.add(user)
-        db.session.commit()
-        
-        # Generate tokens
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
-        
-        return jsonify({
-            'message': 'User registered successfully',
-            'access_token': access_token,
-            'refresh_token': refresh_token,
-            'user': user.to_dict()
-        }), 201
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    data = request.get_json()
+    
+    # Validate input
+    email = data.get('email', '').strip().lower()
+    password = data.get('password', '')
+    full_name = data.get('full_name', '').strip()
+    
+    if not email or not validate_email(email):
+        return jsonify({'error': 'Invalid email address'}), 400
+    
+    if not password or len(password) < 6:
+        return jsonify({'error': 'Password must be at least 6 characters'}), 400
+    
+    # Check if user exists
+    if db.session.query(User.id).filter_by(email=email).first():
+        return jsonify({'error': 'Email already registered'}), 409
+    
+    # Create new user
+    user = User(email=email, full_name=full_name)
+    user.set_password(password)
+    
+    db.session.add(user)
+    db.session.commit()
+    
+    # Generate tokens
+    profile = user.to_dict()
+    claims = user_claims(profile)
+    access_token = create_access_token(identity=user.id, additional_claims=claims)
+    refresh_token = create_refresh_token(identity=user.id, additional_claims=claims)
+    
+    return jsonify({
+        'message': 'User registered successfully',
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'user': profile
+    }), 201
 
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """Login user"""
-    try:
-        data = request.get_json()
-        email = data.get('email', '').strip().lower()
-        password = data.get('password', '')
-        
-        if not email or not password:
-            return jsonify({'error': 'Email and password required'}), 400
-        
-        # Find user
-        user = User.query.filter_by(email=email).first()
-        
-        if not user or not user.check_password(password):
-            return jsonify({'error': 'Invalid email or password'}), 401
-        
-        # Generate tokens
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
-        
-        return jsonify({
-            'message': 'Login successful',
-            'access_token': access_token,
-            'refresh_token': refresh_token,
-            'user': user.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    data = request.get_json()
+    email = data.get('email', '').strip().lower()
+    password = data.get('password', '')
+    
+    if not email or not password:
+        return jsonify({'error': 'Email and password required'}), 400
+    
+    # Find user; only the columns login returns, without building a User instance
+    row = db.session.query(
+        User.id, User.password_hash, User.email, User.full_name, User.role, User.created_date
+    ).filter_by(email=email).first()
+    if not row or not verify_password(row.password_hash, password):
+        return jsonify({'error': 'Invalid email or password'}), 401
+    
+    # Generate tokens
+    profile = {
+        'id': row.id,
+        'email': row.email,
+        'full_name': row.full_name,
+        'role': row.role,
+        'created_date': row.created_date
+    }
+    claims = user_claims(profile)
+    access_token = create_access_token(identity=row.id, additional_claims=claims)
+    refresh_token = create_refresh_token(identity=row.id, additional_claims=claims)
+    
+    return jsonify({
+        'message': 'Login successful',
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'user': profile
+    }), 200
 
 
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
     """Get current user profile"""
-    try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        return jsonify(user.to_dict()), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    return jsonify(user.to_dict()), 200
 
 
 @auth_bp.route('/me', methods=['PUT'])
 @jwt_required()
 def update_profile():
     """Update user profile"""
-    try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        data = request.get_json()
-        
-        # Update allowed fields
-        if 'full_name' in data:
-            user.full_name = data['full_name'].strip()
-        
-        if 'password' in data and len(data['password']) >= 6:
-            user.set_password(data['password'])
-        
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Profile updated successfully',
-            'user': user.to_dict()
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    data = request.get_json()
+    
+    # Update allowed fields
+    if 'full_name' in data:
+        user.full_name = data['full_name'].strip()
+    
+    if 'password' in data and len(data['password']) >= 6:
+        user.set_password(data['password'])
+    
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Profile updated successfully',
+        'user': user.to_dict()
+    }), 200
 
 
 @auth_bp.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)
 def refresh():
     """Refresh access token"""
-    try:
-        user_id = get_jwt_identity()
-        access_token = create_access_token(identity=user_id)
-        
-        return jsonify({'access_token': access_token}), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    
+    # Re-read the claim fields so role changes and renames reach new access tokens
+    row = db.session.query(User.role, User.email, User.full_name).filter_by(id=user_id).first()
+    
+    if not row:
+        return jsonify({'error': 'User not found'}), 404
+    
+    access_token = create_access_token(identity=user_id, additional_claims=user_claims(row._asdict()))
+    
+    return jsonify({'access_token': access_token}), 200
 
 
 @auth_bp.route('/invite', methods=['POST'])
 @jwt_required()
 def invite_user():
     """Invite a new user (admin only for admin invites)"""
-    try:
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        data = request.get_json()
-        email = data.get('email', '').strip().lower()
-        role = data.get('role', 'user')
-        
-        # Only admins can invite other admins
-        if role == 'admin' and current_user.role != 'admin':
-            return jsonify({'error': 'Only admins can invite admin users'}), 403
-        
-        if not validate_email(email):
-            return jsonify({'error': 'Invalid email address'}), 400
-        
-        # Check if user exists
-        if User.query.filter_by(email=email).first():
-            return jsonify({'error': 'User already exists'}), 409
-        
-        # Here you would send an invitation email
-        # For now, we'll just return success
-        
-        return jsonify({
-            'message': f'Invitation sent to {email}',
-            'email': email,
-            'role': role
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+    current_user_id = get_jwt_identity()
+    current_role = db.session.query(User.role).filter_by(id=current_user_id).scalar()
+    
+    data = request.get_json()
+    email = data.get('email', '').strip().lower()
+    role = data.get('role', 'user')
+    
+    # Only admins can invite other admins
+    if role == 'admin' and current_role != 'admin':
+        return jsonify({'error': 'Only admins can invite admin users'}), 403
+    
+    if not validate_email(email):
+        return jsonify({'error': 'Invalid email address'}), 400
+    
+    # Check if user exists
+    if db.session.query(User.id).filter_by(email=email).first():
+        return jsonify({'error': 'User already exists'}), 409
+    
+    # Here you would send an invitation email
+    # For now, we'll just return success
+    
+    return jsonify({
+        'message': f'Invitation sent to {email}',
+        'email': email,
+        'role': role
+    }), 200
\ No newline at end of file
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask_models import User, CommunityPost
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from sqlalchemy import func, insert, update
+from flask_models import CommunityPost
 from flask_app import db
+from flask_utils import keyset_query, not_modified, page_limit, stream_page, with_validators
 
 community_bp = Blueprint('community', __name__)
 
@@ -10,155 +12,146 @@ community_bp = Blueprint('community', __name__)
 @jwt_required()
 def get_posts():
     """Get community posts"""
-    try:
-        category = request.args.get('category')
-        limit = int(request.args.get('limit', 20))
-        offset = int(request.args.get('offset', 0))
-        
-        query = CommunityPost.query
-        
-        if category:
-            query = query.filter_by(category=category)
-        
-        posts = query.order_by(CommunityPost.created_date.desc())\
-            .limit(limit)\
-            .offset(offset)\
-            .all()
-        
-        return jsonify([p.to_dict() for p in posts]), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    category = request.args.get('category')
+    limit = page_limit(20)
+    offset = request.args.get('offset', 0, type=int)
+    
+    query = CommunityPost.list_query()
+    
+    if category:
+        query = query.filter(CommunityPost.category == category)
+    
+    query = keyset_query(query, CommunityPost, limit, request.args.get('cursor'), offset)
+    
+    return stream_page(query, limit)
 
 
 @community_bp.route('/posts', methods=['POST'])
 @jwt_required()
 def create_post():
     """Create a new community post"""
-    try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        data = request.get_json()
-        content = data.get('content', '').strip()
-        category = data.get('category', 'general')
-        
-        if not content:
-            return jsonify({'error': 'Content is required'}), 400
-        
-        post = CommunityPost(
-            author_id=user.id,
-            content=content,
-            category=category
-        )
-        
-        db.session.add(post)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Post created successfully',
-            'post': post.to_dict()
-        }), 201
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    
+    data = request.get_json()
+    content = data.get('content', '').strip()
+    category = data.get('category', 'general')
+    
+    if not content:
+        return jsonify({'error': 'Content is required'}), 400
+    
+    # Core INSERT ... RETURNING skips the unit-of-work flush; author fields come from the token
+    post = db.session.execute(
+        insert(CommunityPost)
+        .values(author_id=user_id, content=content, category=category)
+        .returning(CommunityPost)
+    ).scalar_one()
+    claims = get_jwt()
+    payload = post.to_dict_as(claims.get('email'), claims.get('full_name'))
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Post created successfully',
+        'post': payload
+    }), 201
 
 
 @community_bp.route('/posts/<int:post_id>', methods=['GET'])
 @jwt_required()
 def get_post(post_id):
     """Get specific post"""
-    try:
-        post = CommunityPost.query.get(post_id)
-        
-        if not post:
-            return jsonify({'error': 'Post not found'}), 404
-        
-        return jsonify(post.to_dict()), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Read just the version column first so up-to-date clients skip loading the row
+    modified = db.session.query(
+        func.coalesce(CommunityPost.updated_date, CommunityPost.created_date)
+    ).filter(CommunityPost.id == post_id).scalar()
+    
+    if modified is None:
+        return jsonify({'error': 'Post not found'}), 404
+    
+    cached = not_modified(post_id, modified)
+    if cached:
+        return cached
+    
+    post = CommunityPost.query.get(post_id)
+    
+    return with_validators(jsonify(post.to_dict()), post_id, modified)
 
 
 @community_bp.route('/posts/<int:post_id>', methods=['PUT'])
 @jwt_required()
 def update_post(post_id):
     """Update post (author only)"""
-    try:
-        user_id = get_jwt_identity()
-        post = CommunityPost.query.get(post_id)
-        
-        if not post:
-            return jsonify({'error': 'Post not found'}), 404
-        
-        if post.author_id != user_id:
-            return jsonify({'error': 'Unauthorized'}), 403
-        
-        data = request.get_json()
-        
-        if 'content' in data:
-            post.content = data['content'].strip()
-        
-        if 'category' in data:
-            post.category = data['category']
-        
+    user_id = get_jwt_identity()
+    post = CommunityPost.query.get(post_id)
+    
+    if not post:
+        return jsonify({'error': 'Post not found'}), 404
+    
+    if post.author_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json()
+    updates = {}
+    
+    if 'content' in data:
+        updates['content'] = data['content'].strip()
+    
+    if 'category' in data:
+        updates['category'] = data['category']
+    
+    # Only assign what differs so idempotent retries skip the UPDATE and commit
+    changed = False
+    for field, value in updates.items():
+        if getattr(post, field) != value:
+            setattr(post, field, value)
+            changed = True
+    
+    if changed:
         db.session.commit()
-        
-        return jsonify({
-            'message': 'Post updated successfully',
-            'post': post.to_dict()
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'message': 'Post updated successfully',
+        'post': post.to_dict()
+    }), 200
 
 
 @community_bp.route('/posts/<int:post_id>', methods=['DELETE'])
 @jwt_required()
 def delete_post(post_id):
     """Delete post (author or admin only)"""
-    try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        post = CommunityPost.query.get(post_id)
-        
-        if not post:
-            return jsonify({'error': 'Post not found'}), 404
-        
-        # Only author or admin can delete
-        if post.author_id != user_id and user.role != 'admin':
-            return jsonify({'error': 'Unauthorized'}), 403
-        
-        db.session.delete(post)
-        db.session.commit()
-        
-        return jsonify({'message': 'Post deleted successfully'}), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    post = CommunityPost.query.get(post_id)
+    
+    if not post:
+        return jsonify({'error': 'Post not found'}), 404
+    
+    # Only author or admin can delete
+    if post.author_id != user_id and get_jwt().get('role') != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    db.session.delete(post)
+    db.session.commit()
+    
+    return jsonify({'message': 'Post deleted successfully'}), 200
 
 
 @community_bp.route('/posts/<int:post_id>/like', methods=['POST'])
 @jwt_required()
 def like_post(post_id):
     """Like a post"""
-    try:
-        post = CommunityPost.query.get(post_id)
-        
-        if not post:
-            return jsonify({'error': 'Post not found'}), 404
-        
-        post.likes_count += 1
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Post liked',
-            'likes_count': post.likes_count
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+    # Increment in SQL so concurrent likes are not lost and no row is loaded
+    likes_count = db.session.execute(
+        update(CommunityPost)
+        .where(CommunityPost.id == post_id)
+        .values(likes_count=CommunityPost.likes_count + 1)
+        .returning(CommunityPost.likes_count)
+    ).scalar()
+    
+    if likes_count is None:
+        return jsonify({'error': 'Post not found'}), 404
+    
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Post liked',
+        'likes_count': likes_count
+    }), 200
\ No newline at end of file
@@ -1,10 +1,24 @@
 import os
+from sqlalchemy.pool import NullPool
 from datetime import timedelta
 
 class Config:
     """Base configuration"""
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Keep pool_size + max_overflow at or above the concurrent requests per worker. pool_recycle
+    # retires connections before server-side idle timeouts; pre-ping also catches database restarts
+    # at the cost of a round trip per checkout, so it can be turned off with DB_POOL_PRE_PING=0
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 40)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') != '0',
+        'pool_recycle': 1800,
+        'pool_use_lifo': True
+    }
+    # Behind a transaction-mode pooler such as PgBouncer, let it own the pool
+    if os.getenv('DB_EXTERNAL_POOL'):
+        SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': NullPool}
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, insert
 from flask_models import Course
 from flask_app import db
+from flask_utils import keyset_query, not_modified, page_limit, stream_page, with_validators
 
 masterclass_bp = Blueprint('masterclass', __name__)
 
@@ -10,55 +12,53 @@ masterclass_bp = Blueprint('masterclass', __name__)
 @jwt_required()
 def get_courses():
     """Get all courses"""
-    try:
-        level = request.args.get('level')
-        category = request.args.get('category')
-        limit = int(request.args.get('limit', 50))
-        offset = int(request.args.get('offset', 0))
-        
-        query = Course.query
-        
-        if level:
-            query = query.filter_by(level=level)
-        
-        if category:
-            query = query.filter_by(category=category)
-        
-        courses = query.order_by(Course.created_date.desc())\
-            .limit(limit)\
-            .offset(offset)\
-            .all()
-        
-        return jsonify([c.to_dict() for c in courses]), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    level = request.args.get('level')
+    category = request.args.get('category')
+    limit = page_limit(50)
+    offset = request.args.get('offset', 0, type=int)
+    
+    query = Course.list_query()
+    
+    if level:
+        query = query.filter(Course.level == level)
+    
+    if category:
+        query = query.filter(Course.category == category)
+    
+    query = keyset_query(query, Course, limit, request.args.get('cursor'), offset)
+    
+    return stream_page(query, limit)
 
 
 @masterclass_bp.route('/courses/<int:course_id>', methods=['GET'])
 @jwt_required()
 def get_course(course_id):
     """Get specific course details"""
-    try:
-        course = Course.query.get(course_id)
-        
-        if not course:
-            return jsonify({'error': 'Course not found'}), 404
-        
-        return jsonify(course.to_dict()), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Read just the version column first so up-to-date clients skip loading the row
+    modified = db.session.query(
+        func.coalesce(Course.updated_date, Course.created_date)
+    ).filter(Course.id == course_id).scalar()
+    
+    if modified is None:
+        return jsonify({'error': 'Course not found'}), 404
+    
+    cached = not_modified(course_id, modified)
+    if cached:
+        return cached
+    
+    course = Course.query.get(course_id)
+    
+    return with_validators(jsonify(course.to_dict()), course_id, modified)
 
 
 @masterclass_bp.route('/courses', methods=['POST'])
 @jwt_required()
 def create_course():
     """Create a new course (admin only)"""
-    try:
-        data = request.get_json()
-        
-        course = Course(
+    data = request.get_json()
+    
+    course = db.session.execute(
+        insert(Course).values(
             title=data.get('title'),
             description=data.get('description'),
             level=data.get('level'),
@@ -67,85 +67,72 @@ def create_course():
             video_url=data.get('video_url'),
             thumbnail_url=data.get('thumbnail_url'),
             is_premium=data.get('is_premium', False)
-        )
-        
-        db.session.add(course)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Course created successfully',
-            'course': course.to_dict()
-        }), 201
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        ).returning(Course)
+    ).scalar_one()
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Course created successfully',
+        'course': course.to_dict()
+    }), 201
 
 
 @masterclass_bp.route('/courses/<int:course_id>', methods=['PUT'])
 @jwt_required()
 def update_course(course_id):
     """Update course (admin only)"""
-    try:
-        course = Course.query.get(course_id)
-        
-        if not course:
-            return jsonify({'error': 'Course not found'}), 404
-        
-        data = request.get_json()
-        
-        # Update fields
-        for field in ['title', 'description', 'level', 'category', 'duration_minutes', 
-                      'video_url', 'thumbnail_url', 'is_premium']:
-            if field in data:
-                setattr(course, field, data[field])
-        
+    course = Course.query.get(course_id)
+    
+    if not course:
+        return jsonify({'error': 'Course not found'}), 404
+    
+    data = request.get_json()
+    
+    # Update fields that differ; an unchanged PUT skips the UPDATE and commit
+    changed = False
+    for field in ['title', 'description', 'level', 'category', 'duration_minutes', 
+                  'video_url', 'thumbnail_url', 'is_premium']:
+        if field in data and getattr(course, field) != data[field]:
+            setattr(course, field, data[field])
+            changed = True
+    
+    if changed:
         db.session.commit()
-        
-        return jsonify({
-            'message': 'Course updated successfully',
-            'course': course.to_dict()
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'message': 'Course updated successfully',
+        'course': course.to_dict()
+    }), 200
 
 
 @masterclass_bp.route('/courses/<int:course_id>', methods=['DELETE'])
 @jwt_required()
 def delete_course(course_id):
     """Delete course (admin only)"""
-    try:
-        course = Course.query.get(course_id)
-        
-        if not course:
-            return jsonify({'error': 'Course not found'}), 404
-        
-        db.session.delete(course)
-        db.session.commit()
-        
-        return jsonify({'message': 'Course deleted successfully'}), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    course = Course.query.get(course_id)
+    
+    if not course:
+        return jsonify({'error': 'Course not found'}), 404
+    
+    db.session.delete(course)
+    db.session.commit()
+    
+    return jsonify({'message': 'Course deleted successfully'}), 200
 
 
 @masterclass_bp.route('/stats', methods=['GET'])
 @jwt_required()
 def get_stats():
     """Get learning statistics"""
-    try:
-        stats = {
-            'total_courses': Course.query.count(),
-            'beginner_courses': Course.query.filter_by(level='beginner').count(),
-            'intermediate_courses': Course.query.filter_by(level='intermediate').count(),
-            'advanced_courses': Course.query.filter_by(level='advanced').count(),
-            'premium_courses': Course.query.filter_by(is_premium=True).count()
-        }
-        
-        return jsonify(stats), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+    # One scan of courses with conditional aggregates instead of five COUNT roundtrips
+    counts = db.session.query(
+        func.count().label('total_courses'),
+        func.count().filter(Course.level == 'beginner').label('beginner_courses'),
+        func.count().filter(Course.level == 'intermediate').label('intermediate_courses'),
+        func.count().filter(Course.level == 'advanced').label('advanced_courses'),
+        func.count().filter(Course.is_premium.is_(True)).label('premium_courses')
+    ).select_from(Course).one()
+    
+    stats = dict(counts._mapping)
+    
+    return jsonify(stats), 200
\ No newline at end of file
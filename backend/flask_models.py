@@ -1,8 +1,60 @@
 from flask_app import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+import functools
 
-class User(db.Model):
+# argon2-cffi releases the GIL while hashing, unlike Werkzeug's PBKDF2
+_PASSWORD_HASHER = PasswordHasher()
+
+
+def hash_password(password):
+    """Hash a password for storage"""
+    return _PASSWORD_HASHER.hash(password)
+
+
+def verify_password(password_hash, password):
+    """Check a password against an argon2 hash, or a Werkzeug hash stored before the switch"""
+    if not password_hash.startswith('$argon2'):
+        return check_password_hash(password_hash, password)
+    try:
+        return _PASSWORD_HASHER.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+class CachedDictMixin:
+    """Keeps a model's to_dict() result until the instance is changed, expired or refreshed"""
+    
+    def __setattr__(self, key, value):
+        self.__dict__.pop('_cached_dict', None)
+        super().__setattr__(key, value)
+
+
+@event.listens_for(CachedDictMixin, 'expire', propagate=True)
+def _drop_cached_dict_on_expire(target, attrs):
+    target.__dict__.pop('_cached_dict', None)
+
+
+@event.listens_for(CachedDictMixin, 'refresh', propagate=True)
+def _drop_cached_dict_on_refresh(target, context, attrs):
+    target.__dict__.pop('_cached_dict', None)
+
+
+def cached_dict(to_dict):
+    """Memoize to_dict() per instance; callers must treat the result as read-only"""
+    @functools.wraps(to_dict)
+    def wrapper(self):
+        cached = self.__dict__.get('_cached_dict')
+        if cached is None:
+            cached = self.__dict__['_cached_dict'] = to_dict(self)
+        return cached
+    return wrapper
+
+
+class User(CachedDictMixin, db.Model):
     __tablename__ = 'users'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -13,29 +65,39 @@ class User(db.Model):
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relationships
-    challenges = db.relationship('Challenge', backref='user', lazy=True, cascade='all, delete-orphan')
-    trades = db.relationship('Trade', backref='user', lazy=True, cascade='all, delete-orphan')
-    posts = db.relationship('CommunityPost', backref='author', lazy=True, cascade='all, delete-orphan')
+    # Relationships; collections never lazy-load, query with selectinload(User.<name>) when needed
+    challenges = db.relationship('Challenge', back_populates='user', lazy='raise', cascade='all, delete-orphan')
+    trades = db.relationship('Trade', back_populates='user', lazy='raise', cascade='all, delete-orphan')
+    posts = db.relationship('CommunityPost', back_populates='author', lazy='raise', cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
     
+    @cached_dict
     def to_dict(self):
         return {
             'id': self.id,
             'email': self.email,
             'full_name': self.full_name,
             'role': self.role,
-            'created_date': self.created_date.isoformat()
+            'created_date': self.created_date
         }
 
 
-class Challenge(db.Model):
+class Challenge(CachedDictMixin, db.Model):
     __tablename__ = 'challenges'
+    __table_args__ = (
+        # get_challenges: user_id [+ status], keyset pages on (created_date, id) newest first
+        db.Index('ix_challenges_user_status_created_date_id', 'user_id', 'status', 'created_date', 'id'),
+        # get_leaderboard: active challenges by profit, scanned backwards for DESC; the included
+        # columns make it an index-only scan, leaving only the users join to touch a heap
+        db.Index('ix_challenges_active_profit', 'profit_percent',
+                 postgresql_include=['user_id', 'current_balance', 'tier'],
+                 postgresql_where=db.text("status = 'active'")),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -53,12 +115,18 @@ class Challenge(db.Model):
     updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
+    user = db.relationship('User', back_populates='challenges')
     trades = db.relationship('Trade', backref='challenge', lazy=True, cascade='all, delete-orphan')
     
+    @cached_dict
     def to_dict(self):
+        return self.to_dict_as(self.user.email)
+    
+    def to_dict_as(self, user_email):
+        """Serialize with the user's email supplied by the caller instead of loading the user"""
         return {
             'id': self.id,
-            'user_email': self.user.email,
+            'user_email': user_email,
             'tier': self.tier,
             'initial_balance': self.initial_balance,
             'current_balance': self.current_balance,
@@ -69,13 +137,27 @@ class Challenge(db.Model):
             'profit_percent': self.profit_percent,
             'payment_method': self.payment_method,
             'amount_paid': self.amount_paid,
-            'created_date': self.created_date.isoformat(),
-            'updated_date': self.updated_date.isoformat()
+            'created_date': self.created_date,
+            'updated_date': self.updated_date
         }
+    
+    @classmethod
+    def list_query(cls):
+        """Read-only rows with the to_dict() fields, joining the user instead of loading it per row"""
+        return db.session.query(
+            cls.id, User.email.label('user_email'), cls.tier, cls.initial_balance, cls.current_balance,
+            cls.highest_balance, cls.daily_start_balance, cls.status, cls.fail_reason, cls.profit_percent,
+            cls.payment_method, cls.amount_paid, cls.created_date, cls.updated_date
+        ).join(User, cls.user_id == User.id)
 
 
-class Trade(db.Model):
+class Trade(CachedDictMixin, db.Model):
     __tablename__ = 'trades'
+    __table_args__ = (
+        # get_trades: user_id [+ challenge_id] [+ status], keyset pages on (created_date, id) newest first
+        db.Index('ix_trades_user_challenge_status_created_date_id', 'user_id', 'challenge_id', 'status', 'created_date', 'id'),
+        db.Index('ix_trades_user_created_date_id', 'user_id', 'created_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), nullable=False)
@@ -90,11 +172,19 @@ class Trade(db.Model):
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Relationships
+    user = db.relationship('User', back_populates='trades')
+    
+    @cached_dict
     def to_dict(self):
+        return self.to_dict_as(self.user.email)
+    
+    def to_dict_as(self, user_email):
+        """Serialize with the user's email supplied by the caller instead of loading the user"""
         return {
             'id': self.id,
             'challenge_id': self.challenge_id,
-            'user_email': self.user.email,
+            'user_email': user_email,
             'symbol': self.symbol,
             'type': self.type,
             'quantity': self.quantity,
@@ -102,13 +192,27 @@ class Trade(db.Model):
             'exit_price': self.exit_price,
             'profit_loss': self.profit_loss,
             'status': self.status,
-            'created_date': self.created_date.isoformat(),
-            'updated_date': self.updated_date.isoformat()
+            'created_date': self.created_date,
+            'updated_date': self.updated_date
         }
+    
+    @classmethod
+    def list_query(cls):
+        """Read-only rows with the to_dict() fields, joining the user instead of loading it per row"""
+        return db.session.query(
+            cls.id, cls.challenge_id, User.email.label('user_email'), cls.symbol, cls.type, cls.quantity,
+            cls.entry_price, cls.exit_price, cls.profit_loss, cls.status, cls.created_date, cls.updated_date
+        ).join(User, cls.user_id == User.id)
 
 
-class NewsArticle(db.Model):
+class NewsArticle(CachedDictMixin, db.Model):
     __tablename__ = 'news_articles'
+    # Back keyset pagination on (created_date, id), unfiltered and per category;
+    # scanned backwards for newest-first pages
+    __table_args__ = (
+        db.Index('ix_news_articles_created_date_id', 'created_date', 'id'),
+        db.Index('ix_news_articles_category_created_date_id', 'category', 'created_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -119,6 +223,7 @@ class NewsArticle(db.Model):
     external_url = db.Column(db.String(500))
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @cached_dict
     def to_dict(self):
         return {
             'id': self.id,
@@ -128,12 +233,26 @@ class NewsArticle(db.Model):
             'category': self.category,
             'image_url': self.image_url,
             'external_url': self.external_url,
-            'created_date': self.created_date.isoformat()
+            'created_date': self.created_date
         }
+    
+    @classmethod
+    def list_query(cls):
+        """Read-only rows with the to_dict() fields, skipping ORM instance hydration"""
+        return db.session.query(
+            cls.id, cls.title, cls.summary, cls.source, cls.category,
+            cls.image_url, cls.external_url, cls.created_date
+        )
 
 
-class CommunityPost(db.Model):
+class CommunityPost(CachedDictMixin, db.Model):
     __tablename__ = 'community_posts'
+    # Back keyset pagination on (created_date, id), unfiltered and per category;
+    # scanned backwards for newest-first pages
+    __table_args__ = (
+        db.Index('ix_community_posts_created_date_id', 'created_date', 'id'),
+        db.Index('ix_community_posts_category_created_date_id', 'category', 'created_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -144,22 +263,47 @@ class CommunityPost(db.Model):
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
     updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Relationships
+    author = db.relationship('User', back_populates='posts')
+    
+    @cached_dict
     def to_dict(self):
+        return self.to_dict_as(self.author.email, self.author.full_name)
+    
+    def to_dict_as(self, author_email, author_name):
+        """Serialize with author fields supplied by the caller instead of loading the author"""
         return {
             'id': self.id,
-            'author_email': self.author.email,
-            'author_name': self.author.full_name,
+            'author_email': author_email,
+            'author_name': author_name,
             'content': self.content,
             'category': self.category,
             'likes_count': self.likes_count,
             'comments_count': self.comments_count,
-            'created_date': self.created_date.isoformat(),
-            'updated_date': self.updated_date.isoformat()
+            'created_date': self.created_date,
+            'updated_date': self.updated_date
         }
+    
+    @classmethod
+    def list_query(cls):
+        """Read-only rows with the to_dict() fields, joining the author instead of loading it per row"""
+        return db.session.query(
+            cls.id, User.email.label('author_email'), User.full_name.label('author_name'),
+            cls.content, cls.category, cls.likes_count, cls.comments_count,
+            cls.created_date, cls.updated_date
+        ).join(User, cls.author_id == User.id)
 
 
-class Course(db.Model):
+class Course(CachedDictMixin, db.Model):
     __tablename__ = 'courses'
+    # Backs keyset pagination on (created_date, id); scanned backwards for newest-first pages
+    __table_args__ = (
+        db.Index('ix_courses_created_date_id', 'created_date', 'id'),
+        db.Index('ix_courses_level', 'level'),
+        db.Index('ix_courses_category', 'category'),
+        # Partial index so the premium count in get_stats is an index-only scan
+        db.Index('ix_courses_premium', 'id', postgresql_where=db.text('is_premium')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -171,7 +315,9 @@ class Course(db.Model):
     thumbnail_url = db.Column(db.String(500))
     is_premium = db.Column(db.Boolean, default=False)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    @cached_dict
     def to_dict(self):
         return {
             'id': self.id,
@@ -183,5 +329,14 @@ class Course(db.Model):
             'video_url': self.video_url,
             'thumbnail_url': self.thumbnail_url,
             'is_premium': self.is_premium,
-            'created_date': self.created_date.isoformat()
-        }
\ No newline at end of file
+            'created_date': self.created_date,
+            'updated_date': self.updated_date
+        }
+    
+    @classmethod
+    def list_query(cls):
+        """Read-only rows with the to_dict() fields, skipping ORM instance hydration"""
+        return db.session.query(
+            cls.id, cls.title, cls.description, cls.level, cls.category, cls.duration_minutes,
+            cls.video_url, cls.thumbnail_url, cls.is_premium, cls.created_date, cls.updated_date
+        )
\ No newline at end of file
@@ -1,114 +1,123 @@
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
 from flask_models import NewsArticle
 from flask_app import db
+from flask_utils import keyset_query, not_modified, page_limit, stream_page, with_validators
+from sqlalchemy import insert
 from datetime import datetime, timedelta
+from cachetools import TTLCache
+import threading
 
 news_bp = Blueprint('news', __name__)
 
+# Serialized /trending bodies; bumping the version orphans entries when articles change
+_TRENDING_CACHE = TTLCache(maxsize=64, ttl=60)
+_TRENDING_CACHE_LOCK = threading.Lock()
+_trending_version = 0
+
+
+def invalidate_trending():
+    """Drop cached trending responses after an article is added or removed"""
+    global _trending_version
+    with _TRENDING_CACHE_LOCK:
+        _trending_version += 1
+
 
 @news_bp.route('/articles', methods=['GET'])
 def get_articles():
     """Get news articles"""
-    try:
-        category = request.args.get('category')
-        limit = int(request.args.get('limit', 20))
-        offset = int(request.args.get('offset', 0))
-        
-        query = NewsArticle.query
-        
-        if category:
-            query = query.filter_by(category=category)
-        
-        articles = query.order_by(NewsArticle.created_date.desc())\
-            .limit(limit)\
-            .offset(offset)\
-            .all()
-        
-        return jsonify([a.to_dict() for a in articles]), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    category = request.args.get('category')
+    limit = page_limit(20)
+    offset = request.args.get('offset', 0, type=int)
+    
+    query = NewsArticle.list_query()
+    
+    if category:
+        query = query.filter(NewsArticle.category == category)
+    
+    query = keyset_query(query, NewsArticle, limit, request.args.get('cursor'), offset)
+    
+    return stream_page(query, limit)
 
 
 @news_bp.route('/articles/<int:article_id>', methods=['GET'])
 def get_article(article_id):
     """Get specific article"""
-    try:
-        article = NewsArticle.query.get(article_id)
-        
-        if not article:
-            return jsonify({'error': 'Article not found'}), 404
-        
-        return jsonify(article.to_dict()), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Read just the version column first so up-to-date clients skip loading the row
+    modified = db.session.query(NewsArticle.created_date).filter(NewsArticle.id == article_id).scalar()
+    
+    if modified is None:
+        return jsonify({'error': 'Article not found'}), 404
+    
+    cached = not_modified(article_id, modified)
+    if cached:
+        return cached
+    
+    article = NewsArticle.query.get(article_id)
+    
+    return with_validators(jsonify(article.to_dict()), article_id, modified)
 
 
 @news_bp.route('/articles', methods=['POST'])
 @jwt_required()
 def create_article():
     """Create news article (admin only)"""
-    try:
-        data = request.get_json()
-        
-        article = NewsArticle(
+    data = request.get_json()
+    
+    article = db.session.execute(
+        insert(NewsArticle).values(
             title=data.get('title'),
             summary=data.get('summary'),
             source=data.get('source'),
             category=data.get('category'),
             image_url=data.get('image_url'),
             external_url=data.get('external_url')
-        )
-        
-        db.session.add(article)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Article created successfully',
-            'article': article.to_dict()
-        }), 201
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        ).returning(NewsArticle)
+    ).scalar_one()
+    db.session.commit()
+    invalidate_trending()
+    
+    return jsonify({
+        'message': 'Article created successfully',
+        'article': article.to_dict()
+    }), 201
 
 
 @news_bp.route('/articles/<int:article_id>', methods=['DELETE'])
 @jwt_required()
 def delete_article(article_id):
     """Delete news article (admin only)"""
-    try:
-        article = NewsArticle.query.get(article_id)
-        
-        if not article:
-            return jsonify({'error': 'Article not found'}), 404
-        
-        db.session.delete(article)
-        db.session.commit()
-        
-        return jsonify({'message': 'Article deleted successfully'}), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    article = NewsArticle.query.get(article_id)
+    
+    if not article:
+        return jsonify({'error': 'Article not found'}), 404
+    
+    db.session.delete(article)
+    db.session.commit()
+    invalidate_trending()
+    
+    return jsonify({'message': 'Article deleted successfully'}), 200
 
 
 @news_bp.route('/trending', methods=['GET'])
 def get_trending():
     """Get trending news from last 24 hours"""
-    try:
+    with _TRENDING_CACHE_LOCK:
+        key = (_trending_version,)
+        body = _TRENDING_CACHE.get(key)
+    
+    if body is None:
         yesterday = datetime.utcnow() - timedelta(days=1)
-        
+    
         articles = NewsArticle.query\
             .filter(NewsArticle.created_date >= yesterday)\
             .order_by(NewsArticle.created_date.desc())\
             .limit(10)\
             .all()
-        
-        return jsonify([a.to_dict() for a in articles]), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+    
+        body = current_app.json.dumps([a.to_dict() for a in articles]).encode()
+        with _TRENDING_CACHE_LOCK:
+            _TRENDING_CACHE[key] = body
+    
+    return Response(body, 200, mimetype='application/json')
\ No newline at end of file
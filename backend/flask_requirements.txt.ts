@@ -6,4 +6,7 @@ Flask-Migrate==4.0.5
 psycopg2-binary==2.9.9
 python-dotenv==1.0.0
 gunicorn==21.2.0
-Werkzeug==3.0.1
\ No newline at end of file
+Werkzeug==3.0.1
+cachetools==5.3.2
+orjson==3.9.10
+argon2-cffi==23.1.0
\ No newline at end of file
@@ -1,286 +1,319 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, current_app, g, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from flask_models import User, Challenge, Trade
 from flask_app import db
+from flask_utils import keyset_query, page_limit, stream_page
 from datetime import datetime
+from collections import namedtuple
+from cachetools import TTLCache
+import threading
+import math
 
 trading_bp = Blueprint('trading', __name__)
 
-# Tier configurations
+# Serialized /leaderboard body; bumping the version orphans it when a challenge leaves the board
+_LEADERBOARD_CACHE = TTLCache(maxsize=4, ttl=10)
+_LEADERBOARD_CACHE_LOCK = threading.Lock()
+_leaderboard_version = 0
+
+
+def invalidate_leaderboard():
+    """Drop the cached leaderboard after a challenge passes or fails"""
+    global _leaderboard_version
+    with _LEADERBOARD_CACHE_LOCK:
+        _leaderboard_version += 1
+
+# Tier configurations; limits are also kept as fractions and the fail reasons pre-formatted,
+# so close_trade doesn't recompute them
+TierConfig = namedtuple('TierConfig', [
+    'initial_balance', 'price', 'max_daily_loss_percent', 'max_total_loss_percent',
+    'profit_target_percent', 'max_daily_loss_fraction', 'max_total_loss_fraction',
+    'daily_loss_reason', 'total_loss_reason'
+])
+
+def _tier(initial_balance, price, max_daily_loss_percent, max_total_loss_percent, profit_target_percent):
+    return TierConfig(
+        initial_balance, price, max_daily_loss_percent, max_total_loss_percent, profit_target_percent,
+        max_daily_loss_percent / 100, max_total_loss_percent / 100,
+        f'Exceeded {max_daily_loss_percent}% daily loss limit',
+        f'Exceeded {max_total_loss_percent}% total loss limit'
+    )
+
 TIER_CONFIG = {
-    'starter': {
-        'initial_balance': 10000,
-        'price': 99,
-        'max_daily_loss_percent': 5,
-        'max_total_loss_percent': 10,
-        'profit_target_percent': 10
-    },
-    'pro': {
-        'initial_balance': 50000,
-        'price': 299,
-        'max_daily_loss_percent': 5,
-        'max_total_loss_percent': 10,
-        'profit_target_percent': 10
-    },
-    'elite': {
-        'initial_balance': 100000,
-        'price': 599,
-        'max_daily_loss_percent': 5,
-        'max_total_loss_percent': 10,
-        'profit_target_percent': 10
-    }
+    'starter': _tier(initial_balance=10000, price=99, max_daily_loss_percent=5,
+                     max_total_loss_percent=10, profit_target_percent=10),
+    'pro': _tier(initial_balance=50000, price=299, max_daily_loss_percent=5,
+                 max_total_loss_percent=10, profit_target_percent=10),
+    'elite': _tier(initial_balance=100000, price=599, max_daily_loss_percent=5,
+                   max_total_loss_percent=10, profit_target_percent=10)
 }
 
+INVALID_TIER_ERROR = 'Invalid tier. Must be starter, pro, or elite'
+
+TRADE_TYPES = frozenset({'buy', 'sell'})
+
+
+def _positive_number(value):
+    """Return a JSON number, or a numeric string, if it is positive and finite; None if missing or invalid"""
+    if type(value) is bool:
+        return None
+    if type(value) is not float and type(value) is not int:
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+    return value if 0 < value < math.inf else None
+
+
+@trading_bp.after_request
+def commit_request(response):
+    """Commit the request's writes once, before the response is sent; views only flush
+
+    Reads are left alone: streamed list pages keep fetching from their cursor while the
+    body is sent, and a commit here would close it. The session is removed at teardown.
+    """
+    if request.method in ('GET', 'HEAD'):
+        return response
+    if response.status_code < 400:
+        db.session.commit()
+        if g.pop('leaderboard_changed', False):
+            invalidate_leaderboard()
+    else:
+        db.session.rollback()
+    return response
+
 
 @trading_bp.route('/challenges', methods=['POST'])
 @jwt_required()
 def create_challenge():
     """Create a new trading challenge"""
+    user_id = get_jwt_identity()
+    
+    data = request.get_json()
+    tier = data.get('tier', '').lower()
+    payment_method = data.get('payment_method')
+    
+    if tier not in TIER_CONFIG:
+        return jsonify({'error': INVALID_TIER_ERROR}), 400
+    
+    # Get tier configuration
+    config = TIER_CONFIG[tier]
+    initial_balance = config.initial_balance
+    
+    # Create challenge; Core INSERT ... RETURNING skips the unit-of-work flush, and the users FK
+    # stands in for loading the user, rejecting a token whose account has been deleted
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        data = request.get_json()
-        tier = data.get('tier', '').lower()
-        payment_method = data.get('payment_method')
-        
-        if tier not in TIER_CONFIG:
-            return jsonify({'error': 'Invalid tier. Must be starter, pro, or elite'}), 400
-        
-        # Get tier configuration
-        config = TIER_CONFIG[tier]
-        initial_balance = config['initial_balance']
-        
-        # Create challenge
-        challenge = Challenge(
-            user_id=user.id,
+        challenge = db.session.execute(insert(Challenge).values(
+            user_id=user_id,
             tier=tier,
             initial_balance=initial_balance,
             current_balance=initial_balance,
             highest_balance=initial_balance,
             daily_start_balance=initial_balance,
             payment_method=payment_method,
-            amount_paid=config['price']
-        )
-        
-        db.session.add(challenge)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Challenge created successfully',
-            'challenge': challenge.to_dict()
-        }), 201
-        
-    except Exception as e:
+            amount_paid=config.price
+        ).returning(Challenge)).scalar_one()
+    except IntegrityError:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': 'User not found'}), 404
+    
+    # The user's email comes from the token
+    return jsonify({
+        'message': 'Challenge created successfully',
+        'challenge': challenge.to_dict_as(get_jwt().get('email'))
+    }), 201
 
 
 @trading_bp.route('/challenges', methods=['GET'])
 @jwt_required()
 def get_challenges():
     """Get user's challenges"""
-    try:
-        user_id = get_jwt_identity()
-        status = request.args.get('status')
-        
-        query = Challenge.query.filter_by(user_id=user_id)
-        
-        if status:
-            query = query.filter_by(status=status)
-        
-        challenges = query.order_by(Challenge.created_date.desc()).all()
-        
-        return jsonify([c.to_dict() for c in challenges]), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    status = request.args.get('status')
+    limit = page_limit(50)
+    
+    query = Challenge.list_query().filter(Challenge.user_id == user_id)
+    
+    if status:
+        query = query.filter(Challenge.status == status)
+    
+    query = keyset_query(query, Challenge, limit, request.args.get('cursor'))
+    
+    return stream_page(query, limit)
 
 
 @trading_bp.route('/challenges/<int:challenge_id>', methods=['GET'])
 @jwt_required()
 def get_challenge(challenge_id):
     """Get specific challenge details"""
-    try:
-        user_id = get_jwt_identity()
-        challenge = Challenge.query.filter_by(id=challenge_id, user_id=user_id).first()
-        
-        if not challenge:
-            return jsonify({'error': 'Challenge not found'}), 404
-        
-        return jsonify(challenge.to_dict()), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    challenge = Challenge.query.filter_by(id=challenge_id, user_id=user_id).first()
+    
+    if not challenge:
+        return jsonify({'error': 'Challenge not found'}), 404
+    
+    return jsonify(challenge.to_dict()), 200
 
 
 @trading_bp.route('/trades', methods=['POST'])
 @jwt_required()
 def execute_trade():
     """Execute a trade"""
-    try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        challenge_id = data.get('challenge_id')
-        symbol = data.get('symbol', '').upper()
-        trade_type = data.get('type', '').lower()
-        quantity = float(data.get('quantity', 0))
-        entry_price = float(data.get('entry_price', 0))
-        
-        # Validate inputs
-        if trade_type not in ['buy', 'sell']:
-            return jsonify({'error': 'Trade type must be buy or sell'}), 400
-        
-        if quantity <= 0 or entry_price <= 0:
-            return jsonify({'error': 'Invalid quantity or price'}), 400
-        
-        # Get challenge
-        challenge = Challenge.query.filter_by(id=challenge_id, user_id=user_id).first()
-        
-        if not challenge:
-            return jsonify({'error': 'Challenge not found'}), 404
-        
-        if challenge.status != 'active':
-            return jsonify({'error': 'Challenge is not active'}), 400
-        
-        # Calculate trade value
-        trade_value = quantity * entry_price
-        
-        # Check if user has enough balance
-        if trade_value > challenge.current_balance:
-            return jsonify({'error': 'Insufficient balance'}), 400
-        
-        # Create trade
-        trade = Trade(
-            challenge_id=challenge.id,
-            user_id=user_id,
-            symbol=symbol,
-            type=trade_type,
-            quantity=quantity,
-            entry_price=entry_price
-        )
-        
-        db.session.add(trade)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Trade executed successfully',
-            'trade': trade.to_dict()
-        }), 201
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    challenge_id = data.get('challenge_id')
+    symbol = data.get('symbol', '').upper()
+    trade_type = data.get('type', '').lower()
+    quantity = _positive_number(data.get('quantity'))
+    entry_price = _positive_number(data.get('entry_price'))
+    
+    # Validate inputs
+    if trade_type not in TRADE_TYPES:
+        return jsonify({'error': 'Trade type must be buy or sell'}), 400
+    
+    if quantity is None or entry_price is None:
+        return jsonify({'error': 'Invalid quantity or price'}), 400
+    
+    # Get challenge by primary key, locked until the request commits so balance checks see concurrent closes
+    challenge = Challenge.query.with_for_update().get(challenge_id)
+    
+    if not challenge or challenge.user_id != user_id:
+        return jsonify({'error': 'Challenge not found'}), 404
+    
+    if challenge.status != 'active':
+        return jsonify({'error': 'Challenge is not active'}), 400
+    
+    # Calculate trade value
+    trade_value = quantity * entry_price
+    
+    # Check if user has enough balance
+    if trade_value > challenge.current_balance:
+        return jsonify({'error': 'Insufficient balance'}), 400
+    
+    # Create trade; Core INSERT ... RETURNING skips the unit-of-work flush
+    trade = db.session.execute(insert(Trade).values(
+        challenge_id=challenge.id,
+        user_id=user_id,
+        symbol=symbol,
+        type=trade_type,
+        quantity=quantity,
+        entry_price=entry_price
+    ).returning(Trade)).scalar_one()
+    
+    return jsonify({
+        'message': 'Trade executed successfully',
+        'trade': trade.to_dict_as(get_jwt().get('email'))
+    }), 201
 
 
 @trading_bp.route('/trades/<int:trade_id>/close', methods=['POST'])
 @jwt_required()
 def close_trade(trade_id):
     """Close an open trade"""
-    try:
-        user_id = get_jwt_identity()
-        data = request.get_json()
-        exit_price = float(data.get('exit_price', 0))
-        
-        if exit_price <= 0:
-            return jsonify({'error': 'Invalid exit price'}), 400
-        
-        # Get trade
-        trade = Trade.query.filter_by(id=trade_id, user_id=user_id).first()
-        
-        if not trade:
-            return jsonify({'error': 'Trade not found'}), 404
-        
-        if trade.status != 'open':
-            return jsonify({'error': 'Trade is already closed'}), 400
-        
-        # Calculate profit/loss
-        if trade.type == 'buy':
-            profit_loss = (exit_price - trade.entry_price) * trade.quantity
-        else:  # sell
-            profit_loss = (trade.entry_price - exit_price) * trade.quantity
-        
-        # Update trade
-        trade.exit_price = exit_price
-        trade.profit_loss = profit_loss
-        trade.status = 'closed'
-        
-        # Update challenge balance
-        challenge = trade.challenge
-        challenge.current_balance += profit_loss
-        challenge.highest_balance = max(challenge.highest_balance, challenge.current_balance)
-        
-        # Calculate profit percentage
-        challenge.profit_percent = ((challenge.current_balance - challenge.initial_balance) / challenge.initial_balance) * 100
-        
-        # Check challenge rules
-        config = TIER_CONFIG[challenge.tier]
-        
-        # Check daily loss limit (5%)
-        daily_loss = challenge.daily_start_balance - challenge.current_balance
-        max_daily_loss = challenge.daily_start_balance * (config['max_daily_loss_percent'] / 100)
-        
-        if daily_loss >= max_daily_loss:
-            challenge.status = 'failed'
-            challenge.fail_reason = f'Exceeded {config["max_daily_loss_percent"]}% daily loss limit'
-        
-        # Check total loss limit (10%)
-        total_loss = challenge.initial_balance - challenge.current_balance
-        max_total_loss = challenge.initial_balance * (config['max_total_loss_percent'] / 100)
-        
-        if total_loss >= max_total_loss:
-            challenge.status = 'failed'
-            challenge.fail_reason = f'Exceeded {config["max_total_loss_percent"]}% total loss limit'
-        
-        # Check profit target (10%)
-        if challenge.profit_percent >= config['profit_target_percent']:
-            challenge.status = 'passed'
-        
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Trade closed successfully',
-            'trade': trade.to_dict(),
-            'challenge': challenge.to_dict()
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    data = request.get_json()
+    exit_price = _positive_number(data.get('exit_price'))
+    
+    if exit_price is None:
+        return jsonify({'error': 'Invalid exit price'}), 400
+    
+    # Get trade by primary key with its challenge in one SELECT ... FOR UPDATE, locking both rows so
+    # two closes of the same trade can't both apply and concurrent closes don't lose balance updates;
+    # an inner join because Postgres can't lock the nullable side of an outer join
+    trade = Trade.query.options(joinedload(Trade.challenge, innerjoin=True)).with_for_update().get(trade_id)
+    
+    if not trade or trade.user_id != user_id:
+        return jsonify({'error': 'Trade not found'}), 404
+    
+    if trade.status != 'open':
+        return jsonify({'error': 'Trade is already closed'}), 400
+    
+    # Calculate profit/loss
+    if trade.type == 'buy':
+        profit_loss = (exit_price - trade.entry_price) * trade.quantity
+    else:  # sell
+        profit_loss = (trade.entry_price - exit_price) * trade.quantity
+    
+    # Update trade
+    trade.exit_price = exit_price
+    trade.profit_loss = profit_loss
+    trade.status = 'closed'
+    
+    # Update challenge balance
+    challenge = trade.challenge
+    challenge.current_balance += profit_loss
+    challenge.highest_balance = max(challenge.highest_balance, challenge.current_balance)
+    
+    # Calculate profit percentage
+    challenge.profit_percent = ((challenge.current_balance - challenge.initial_balance) / challenge.initial_balance) * 100
+    
+    # Check challenge rules; the first rule hit decides the status
+    config = TIER_CONFIG[challenge.tier]
+    balance = challenge.current_balance
+    
+    if balance <= challenge.initial_balance * (1 - config.max_total_loss_fraction):
+        # Total loss limit (10%)
+        challenge.status = 'failed'
+        challenge.fail_reason = config.total_loss_reason
+    elif balance <= challenge.daily_start_balance * (1 - config.max_daily_loss_fraction):
+        # Daily loss limit (5%)
+        challenge.status = 'failed'
+        challenge.fail_reason = config.daily_loss_reason
+    elif challenge.profit_percent >= config.profit_target_percent:
+        # Profit target (10%)
+        challenge.status = 'passed'
+    
+    if challenge.status != 'active':
+        g.leaderboard_changed = True
+    
+    db.session.flush()
+    
+    return jsonify({
+        'message': 'Trade closed successfully',
+        'trade': trade.to_dict(),
+        'challenge': challenge.to_dict()
+    }), 200
 
 
 @trading_bp.route('/trades', methods=['GET'])
 @jwt_required()
 def get_trades():
     """Get user's trades"""
-    try:
-        user_id = get_jwt_identity()
-        challenge_id = request.args.get('challenge_id')
-        status = request.args.get('status')
-        
-        query = Trade.query.filter_by(user_id=user_id)
-        
-        if challenge_id:
-            query = query.filter_by(challenge_id=challenge_id)
-        
-        if status:
-            query = query.filter_by(status=status)
-        
-        trades = query.order_by(Trade.created_date.desc()).all()
-        
-        return jsonify([t.to_dict() for t in trades]), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    user_id = get_jwt_identity()
+    challenge_id = request.args.get('challenge_id')
+    status = request.args.get('status')
+    limit = page_limit(50)
+    
+    query = Trade.list_query().filter(Trade.user_id == user_id)
+    
+    if challenge_id:
+        query = query.filter(Trade.challenge_id == challenge_id)
+    
+    if status:
+        query = query.filter(Trade.status == status)
+    
+    query = keyset_query(query, Trade, limit, request.args.get('cursor'))
+    
+    return stream_page(query, limit)
 
 
 @trading_bp.route('/leaderboard', methods=['GET'])
 def get_leaderboard():
     """Get trading leaderboard"""
-    try:
-        # Get top performers
-        challenges = Challenge.query.filter_by(status='active')\
+    with _LEADERBOARD_CACHE_LOCK:
+        key = (_leaderboard_version,)
+        body = _LEADERBOARD_CACHE.get(key)
+    
+    if body is None:
+        # Get top performers; only the columns the board shows, with the trader's name joined in
+        challenges = db.session.query(
+            User.full_name, Challenge.profit_percent, Challenge.current_balance, Challenge.tier
+        ).join(User, Challenge.user_id == User.id)\
+            .filter(Challenge.status == 'active')\
             .order_by(Challenge.profit_percent.desc())\
             .limit(100)\
             .all()
@@ -289,13 +322,14 @@ def get_leaderboard():
         for idx, challenge in enumerate(challenges, 1):
             leaderboard.append({
                 'rank': idx,
-                'trader': challenge.user.full_name or 'Anonymous',
+                'trader': challenge.full_name or 'Anonymous',
                 'profit_percent': round(challenge.profit_percent, 2),
                 'balance': challenge.current_balance,
                 'tier': challenge.tier
             })
         
-        return jsonify(leaderboard), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        body = current_app.json.dumps(leaderboard).encode()
+        with _LEADERBOARD_CACHE_LOCK:
+            _LEADERBOARD_CACHE[key] = body
+    
+    return Response(body, 200, mimetype='application/json')
\ No newline at end of file
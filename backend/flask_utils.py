@@ -0,0 +1,117 @@
+import base64
+import itertools
+import json
+import orjson
+from datetime import datetime, timezone
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import tuple_
+from sqlalchemy.orm import raiseload
+from werkzeug.exceptions import BadRequest
+
+# Largest page any list endpoint will serve
+MAX_PAGE_SIZE = 200
+
+
+def page_limit(default):
+    """Read ?limit= from the request, clamped to 1..MAX_PAGE_SIZE"""
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PAGE_SIZE))
+
+
+def encode_cursor(created_date, row_id):
+    """Encode the last row's (created_date, id) as an opaque page cursor"""
+    payload = json.dumps([created_date.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a page cursor back into (created_date, id)"""
+    try:
+        created_date, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_date), int(row_id)
+    except (ValueError, TypeError):
+        raise BadRequest('Invalid cursor')
+
+
+def eager(*loaders):
+    """Loader options for list queries; in debug/testing any other lazy load raises"""
+    if current_app.debug or current_app.testing:
+        return loaders + (raiseload('*'),)
+    return loaders
+
+
+def row_etag(row_id, modified):
+    """Weak validator for one version of a row"""
+    return f'{row_id}-{int(modified.timestamp() * 1000000)}'
+
+
+def not_modified(row_id, modified):
+    """Return a 304 when the client's If-None-Match/If-Modified-Since covers this row version, else None"""
+    etag = row_etag(row_id, modified)
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        fresh = since is not None and since >= modified.replace(microsecond=0, tzinfo=timezone.utc)
+    
+    if not fresh:
+        return None
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def with_validators(response, row_id, modified):
+    """Attach the ETag and Last-Modified for a row version to its response"""
+    response.set_etag(row_etag(row_id, modified), weak=True)
+    response.last_modified = modified.replace(tzinfo=timezone.utc)
+    return response
+
+
+def keyset_query(query, model, limit, cursor=None, offset=0):
+    """Narrow query to one newest-first page using (created_date, id) as the cursor
+
+    One row beyond limit is fetched so stream_page can tell whether a next page exists;
+    limits below 1 are treated as 1, as stream_page does.
+    offset is only honoured without a cursor, for older clients.
+    """
+    limit = max(limit, 1)
+    query = query.order_by(model.created_date.desc(), model.id.desc())
+    
+    if cursor:
+        created_date, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_date, model.id) < (created_date, row_id))
+    elif offset:
+        query = query.offset(offset)
+    
+    return query.limit(limit + 1)
+
+
+def stream_page(query, limit):
+    """Stream a keyset page of column rows as {"items": [...], "has_next": ..., "next_cursor": ...}
+
+    The first row is fetched before the response is returned, so the SELECT runs (and any
+    database error reaches the app's error handler) before the status line is sent; the
+    rest are fetched and encoded in chunks. The lookahead row from keyset_query only sets
+    has_next and is not emitted.
+    """
+    limit = max(limit, 1)
+    rows = iter(query.yield_per(50))
+    first = next(rows, None)
+    if first is not None:
+        rows = itertools.chain((first,), rows)
+    
+    def generate():
+        yield b'{"items":['
+        last, count, has_next = None, 0, False
+        for row in rows:
+            if count == limit:
+                has_next = True
+                break
+            if count:
+                yield b','
+            yield orjson.dumps(row._asdict(), option=orjson.OPT_NAIVE_UTC)
+            last, count = row, count + 1
+        next_cursor = encode_cursor(last.created_date, last.id) if has_next and last is not None else None
+        yield b'],"has_next":' + orjson.dumps(has_next) + b',"next_cursor":' + orjson.dumps(next_cursor) + b'}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')